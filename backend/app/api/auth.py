@@ -1,42 +1,68 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..core.database import get_db
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional
+from ..core.database import get_async_db
 from ..models.user import User
 from ..services.auth_service import AuthService
+from ..services.user_cache import user_cache
+from .deps import security
 from . import schemas
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 auth_service = AuthService()
 
 
+# Column behind each unique index, and the message for a duplicate
+UNIQUE_CONFLICTS = (("email", "Email already registered"), ("username", "Username already taken"))
+
+
+def conflict_detail(error: IntegrityError) -> Optional[str]:
+    message = str(error.orig).lower()
+    for column, detail in UNIQUE_CONFLICTS:
+        if f"users.{column}" in message or f"ix_users_{column}" in message:
+            return detail
+    return None
+
+
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already taken")
-    
-    # Create new user
-    hashed_password = auth_service.get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        username=user.username,
-        hashed_password=hashed_password
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    hashed_password = await auth_service.hash_password(user.password)
+    values = {"email": user.email, "username": user.username, "hashed_password": hashed_password, "is_active": True}
+    
+    # A single INSERT: the unique indexes catch duplicates, and RETURNING hands back the
+    # generated columns where the dialect supports it (otherwise created_at is set here)
+    returning = db.bind.dialect.full_returning
+    if not returning:
+        values["created_at"] = datetime.utcnow()
+    statement = insert(User).values(**values)
+    if returning:
+        statement = statement.returning(User.id, User.created_at)
+    
+    try:
+        result = await db.execute(statement)
+        if returning:
+            generated = dict(result.mappings().one())
+        else:
+            generated = {"id": result.inserted_primary_key[0]}
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        detail = conflict_detail(e)
+        if detail is None:
+            raise
+        raise HTTPException(status_code=400, detail=detail)
+    
+    return {**values, **generated}
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
     # First check if user exists
-    user = db.query(User).filter(User.username == credentials.username).first()
+    user = (await db.execute(select(User).where(User.username == credentials.username))).scalars().first()
     
     if not user:
         raise HTTPException(
@@ -46,12 +72,34 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
         )
     
     # If user exists, check password
-    if not auth_service.verify_password(credentials.password, user.hashed_password):
+    valid, new_hash = await auth_service.verify_and_update_password(credentials.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = auth_service.create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
+    if new_hash:
+        # Stored hash used an older work factor. A Core UPDATE skips the ORM hooks that
+        # end the user's sessions - the password itself has not changed.
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+    
+    access_token = auth_service.create_user_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/logout")
+def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = auth_service.verify_token(credentials.credentials)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    auth_service.revoke_token(payload)
+    user_cache.discard(credentials.credentials)
+    return {"message": "Logged out"} 
\ No newline at end of file
@@ -5,6 +5,7 @@ from jose import JWTError
 from ..core.database import get_db
 from ..models.user import User
 from ..services.auth_service import AuthService
+from ..services.user_cache import user_cache
 
 security = HTTPBearer()
 auth_service = AuthService()
@@ -30,9 +31,18 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # Tokens with signed user claims need no lookup; older tokens go through the cache
+    user = auth_service.user_from_claims(payload)
+    if user is not None:
+        return user
+    cached = user_cache.get(credentials.credentials)
+    if cached is not None:
+        return cached
+    
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
+    user_cache.set(credentials.credentials, user, payload.get("exp"))
     return user
 
 
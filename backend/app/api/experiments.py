@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from ..core.database import get_db
 from ..models.user import User
 from ..services.validation_service import ValidationService
+from ..services.admission import Overloaded
 from .deps import get_current_user
 import logging
 
@@ -77,6 +78,8 @@ async def validate_companies(
                 error=error_message
             )
             
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Company validation error: {e}")
         raise HTTPException(
@@ -114,6 +117,8 @@ async def validate_categories(
                 error=error_message
             )
             
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Category validation error: {e}")
         raise HTTPException(
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from ..core.config import settings
 
 
 class UserBase(BaseModel):
@@ -36,7 +37,7 @@ class TokenData(BaseModel):
 
 
 class ExperimentBase(BaseModel):
-    companies: List[str] = Field(..., min_items=1, max_items=5)
+    companies: List[str] = Field(..., min_items=1, max_items=settings.MAX_RANKING_BRANDS)
     categories: List[str] = Field(..., min_items=1, max_items=3)
 
 
@@ -69,4 +70,39 @@ class ExperimentResult(BaseModel):
 
 class ExperimentResponse(BaseModel):
     experiment: ExperimentResult
-    message: str = "Experiment completed successfully" 
\ No newline at end of file
+    message: str = "Experiment completed successfully" 
+
+
+class TrackedExperimentCreate(ExperimentBase):
+    name: Optional[str] = Field(None, max_length=255)
+    interval_seconds: int = Field(settings.TRACKING_DEFAULT_INTERVAL, ge=settings.TRACKING_MIN_INTERVAL)
+
+
+class TrackedExperiment(BaseModel):
+    id: int
+    name: Optional[str] = None
+    companies: List[str]
+    categories: List[str]
+    interval_seconds: int
+    is_active: bool
+    last_run_at: Optional[datetime] = None
+    next_run_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class RankPoint(BaseModel):
+    run_at: datetime
+    rank: float
+
+
+class TrackedSeries(BaseModel):
+    id: int
+    companies: List[str]
+    categories: List[str]
+    runs: List[datetime]  # Runs where at least one rank moved
+    series: Dict[str, Dict[str, List[RankPoint]]]  # {category: {brand: [points]}}
+    latest_rankings: Dict[str, Dict[str, Any]]
+
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from ..core.database import get_db
+from ..models.user import User
+from ..models.tracking import TrackedExperiment
+from .deps import get_current_user
+from . import schemas
+
+router = APIRouter(prefix="/tracking", tags=["tracking"])
+
+
+def _get_owned(tracked_id: int, current_user: User, db: Session) -> TrackedExperiment:
+    tracked = db.query(TrackedExperiment).filter(TrackedExperiment.id == tracked_id).first()
+    if not tracked:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tracked experiment not found")
+    if tracked.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    return tracked
+
+
+@router.post("/", response_model=schemas.TrackedExperiment)
+def create_tracked_experiment(request: schemas.TrackedExperimentCreate, current_user: User = Depends(get_current_user),
+                              db: Session = Depends(get_db)):
+    """Track a brand set; the background scheduler picks it up on its next poll"""
+    tracked = TrackedExperiment(
+        user_id=current_user.id,
+        name=request.name,
+        companies=request.companies,
+        categories=request.categories,
+        interval_seconds=request.interval_seconds,
+        is_active=True,
+        latest_rankings={},
+        next_run_at=datetime.now(timezone.utc),
+    )
+    db.add(tracked)
+    db.commit()
+    db.refresh(tracked)
+    return tracked
+
+
+@router.get("/", response_model=List[schemas.TrackedExperiment])
+def list_tracked_experiments(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return db.query(TrackedExperiment).filter(TrackedExperiment.user_id == current_user.id).all()
+
+
+@router.delete("/{tracked_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_tracked_experiment(tracked_id: int, current_user: User = Depends(get_current_user),
+                              db: Session = Depends(get_db)):
+    tracked = _get_owned(tracked_id, current_user, db)
+    db.delete(tracked)
+    db.commit()
+
+
+@router.get("/{tracked_id}/series", response_model=schemas.TrackedSeries)
+def get_tracked_series(tracked_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Rank time series rebuilt from stored deltas - never calls the LLM"""
+    tracked = _get_owned(tracked_id, current_user, db)
+
+    series = {category: {} for category in tracked.categories}
+    for snapshot in tracked.snapshots:
+        for category, changes in (snapshot.changes or {}).items():
+            for brand, rank in changes.items():
+                series.setdefault(category, {}).setdefault(brand, []).append({"run_at": snapshot.run_at, "rank": rank})
+
+    return {
+        "id": tracked.id,
+        "companies": tracked.companies,
+        "categories": tracked.categories,
+        "runs": [snapshot.run_at for snapshot in tracked.snapshots],
+        "series": series,
+        "latest_rankings": tracked.latest_rankings or {},
+    }
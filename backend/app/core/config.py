@@ -7,17 +7,72 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./brandranker.db"
     DATABASE_PERSISTENT: bool = True
+    # Connection pool (per engine - the sync and async engines each get one)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: float = 30.0
+    # SQLite tuning applied to every new connection (cache_size < 0 is KiB)
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours (24 * 60 minutes)
+    # Verified token -> user snapshot cache for authenticated routes
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_TTL: int = 300
+    # Revoked access tokens: in-memory Bloom filter sizing and how often it is rebuilt from Redis (seconds)
+    REVOCATION_FILTER_CAPACITY: int = 100000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL: float = 10.0
+    # Password hashing: bcrypt work factor (stored hashes are upgraded on login) and its dedicated pool
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUED: int = 64
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_MAX_CONCURRENCY: int = 5
     
     # Perplexity (Priority 1)
     PERPLEXITY_API_KEY: Optional[str] = None
+    PERPLEXITY_MODEL: str = "sonar-pro"
+    PERPLEXITY_MAX_CONCURRENCY: int = 5  # Per API key
+    # Extra keys, comma-separated, pooled with PERPLEXITY_API_KEY
+    PERPLEXITY_API_KEYS: Optional[str] = None
+    # Per-key token bucket: sustained requests/minute and burst size
+    PERPLEXITY_KEY_RPM: float = 50.0
+    PERPLEXITY_KEY_BURST: int = 5
+    # How long a key sits out after a 429 (without Retry-After) or a 401/403
+    API_KEY_EJECT_SECONDS: float = 30.0
+    API_KEY_AUTH_EJECT_SECONDS: float = 600.0
+    
+    # LLM routing - comma-separated providers; "stub" is a local offline provider
+    LLM_PROVIDERS: str = "perplexity,openai"
+    LLM_ROUTER_EWMA_ALPHA: float = 0.2
+    LLM_ROUTER_MAX_ERROR_RATE: float = 0.5
+    LLM_ROUTER_PROBE_INTERVAL: float = 30.0
+
+    # Retries of transient upstream errors (429/5xx/timeouts); attempts include the first call
+    LLM_RETRY_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    # Retries may add at most this fraction of requests over the window, plus a per-second floor
+    LLM_RETRY_BUDGET_RATIO: float = 0.1
+    LLM_RETRY_BUDGET_MIN_PER_SEC: float = 1.0
+    LLM_RETRY_BUDGET_WINDOW: float = 10.0
+    STUB_LLM_LATENCY_MS: int = 0
+    STUB_LLM_MAX_CONCURRENCY: int = 50
+    
+    # Prompt/token budgets - max_tokens is sized per call from brand count and reason length
+    RANKING_REASON_WORDS: int = 25
+    LLM_MAX_COMPLETION_TOKENS: int = 1024
+    LLM_PROMPT_COST_PER_1K: float = 0.003
+    LLM_COMPLETION_COST_PER_1K: float = 0.015
     
     # CORS
     BACKEND_CORS_ORIGINS: str = "http://localhost:3000,http://localhost:8000,https://brand-ranker-app.web.app,https://brand-ranker-app.firebaseapp.com,https://brandranker.vercel.app,https://brandranker.netlify.app,https://brandranker-git-main-apoorv-verma.vercel.app,https://brandranker-apoorv-verma.vercel.app"
@@ -27,7 +82,72 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
-    
+
+    # Upstream LLM concurrency (shared by every ranking route)
+    LLM_MAX_CONCURRENCY: int = 5
+    # Priority lanes sharing the upstream slots: weighted round-robin, plus slots only interactive work may use
+    LLM_LANE_WEIGHTS: str = "interactive:8,batch:3,background:1"
+    LLM_INTERACTIVE_RESERVED_SLOTS: int = 1
+    # Per-user fair queuing: max upstream slots one user may hold (None = no cap) and max queued calls
+    LLM_PER_USER_CONCURRENCY: Optional[int] = None
+    LLM_PER_USER_QUEUE: Optional[int] = 100
+    LLM_QUEUE_FULL_RETRY_AFTER: int = 5
+    # Separate pool of upstream slots for validation calls (bulkhead)
+    VALIDATION_MAX_CONCURRENCY: int = 2
+    # Per-provider slots and per-key tokens validation calls may never take, so ranking keeps them
+    LLM_RANKING_RESERVED_SLOTS: int = 2
+    API_KEY_RANKING_RESERVED_TOKENS: int = 2
+
+    # Ranking limits - sets above the group size go through the tournament engine
+    MAX_RANKING_BRANDS: int = 100
+    RANKING_GROUP_SIZE: int = 5
+
+    # Pairwise preference store (seconds a category's preferences are kept)
+    PREFERENCE_STORE_TTL: int = 604800
+    # Whole-experiment results; matches the per-category rankings cache TTL
+    EXPERIMENT_CACHE_TTL: int = 3600
+    EXPERIMENT_CACHE_MAX_ENTRIES: int = 10000
+
+    # GET /api/experiments/ pages (newest first, keyset cursor in X-Next-Cursor)
+    EXPERIMENTS_PAGE_SIZE: int = 50
+    EXPERIMENTS_MAX_PAGE_SIZE: int = 200
+
+    # Idempotency-Key handling for experiment creation
+    IDEMPOTENCY_KEY_TTL: int = 86400
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 120.0
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+
+    # End-to-end latency budget for ranking requests (seconds), overridable per request via header
+    REQUEST_DEADLINE_HEADER: str = "X-Request-Deadline"
+    REQUEST_DEADLINE_DEFAULT: float = 60.0
+    REQUEST_DEADLINE_MAX: float = 300.0
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+    # Head-room kept before the deadline to store a partial experiment
+    PARTIAL_RESULTS_MARGIN: float = 0.25
+
+    # Admission control: shed expensive requests with 503 + Retry-After above these limits
+    ADMISSION_MAX_EXPERIMENTS: int = 20
+    ADMISSION_MAX_QUEUE_WAIT: float = 10.0
+    ADMISSION_MAX_LOOP_LAG: float = 0.5
+    ADMISSION_RETRY_AFTER: int = 5
+    ADMISSION_LAG_INTERVAL: float = 0.5
+
+    # Tracked experiments - background refresh cadence (seconds)
+    TRACKING_SCHEDULER_ENABLED: bool = True
+    TRACKING_POLL_INTERVAL: float = 60.0
+    TRACKING_DEFAULT_INTERVAL: int = 86400
+    TRACKING_MIN_INTERVAL: int = 3600
+    TRACKING_RETRY_DELAY: int = 300
+
+    # Self-consistency sampling (opt-in per request via "samples")
+    CONSENSUS_MAX_SAMPLES: int = 7
+    CONSENSUS_MIN_SAMPLES: int = 3
+    CONSENSUS_AGREEMENT_THRESHOLD: float = 0.8
+    CONSENSUS_TEMPERATURE: float = 0.7
+
+    # Batch ranking
+    RANK_BATCH_MAX_JOBS: int = 500
+
     # Debug mode
     DEBUG: bool = False
     
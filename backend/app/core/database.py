@@ -1,22 +1,88 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
-# Fix SQLite threading issues in production
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        pool_pre_ping=True,
-        poolclass=None,  # Disable connection pooling for SQLite
-        echo=False
-    )
-else:
-    engine = create_engine(settings.DATABASE_URL)
+
+def async_database_url(url: str) -> str:
+    """The same database through its async driver: aiosqlite for SQLite, asyncpg for PostgreSQL"""
+    scheme, _, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        # asyncpg takes "ssl" rather than libpq's "sslmode"
+        return f"postgresql+asyncpg://{rest.replace('sslmode=', 'ssl=')}"
+    return url
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def pool_options(url: str) -> dict:
+    """Pool sizing from settings; in-memory SQLite keeps its single shared connection"""
+    if is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """WAL lets readers run alongside a writer; NORMAL sync is safe under WAL and skips an fsync per commit"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def create_db_engine(url: str):
+    options = pool_options(url)
+    if options:
+        options["poolclass"] = InstrumentedQueuePool
+    if is_sqlite(url):
+        # Connections are shared across the request threadpool
+        options["connect_args"] = {"check_same_thread": False}
+    db_engine = create_engine(url, **options)
+    if is_sqlite(url):
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(url: str):
+    options = pool_options(url)
+    if options:
+        options["poolclass"] = InstrumentedAsyncQueuePool
+    db_engine = create_async_engine(async_database_url(url), **options)
+    if is_sqlite(url):
+        event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+
+def pool_stats() -> dict:
+    """Checkout wait and utilization for the sync and async pools"""
+    pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+    return {name: pool.get_stats() for name, pool in pools.items() if hasattr(pool, "get_stats")}
+
+
+engine = create_db_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 
+# Async engine for routes that run on the event loop, so queries don't block it
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -25,4 +91,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
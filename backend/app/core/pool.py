@@ -0,0 +1,69 @@
+import time
+import threading
+from typing import Dict, Any
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    """Checkout counts and wait times for one connection pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+class InstrumentedPoolMixin:
+    """Times how long each checkout waits for a free connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool occupancy and checkout wait"""
+        stats = self.stats
+        capacity = self.size() + max(0, self._max_overflow)
+        checked_out = self.checkedout()
+        with stats.lock:
+            return {
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": checked_out,
+                "idle": self.checkedin(),
+                "utilization": round(checked_out / capacity, 4) if capacity else 0,
+                "checkouts": stats.checkouts,
+                "timeouts": stats.timeouts,
+                "avg_wait_ms": round(stats.wait_total / stats.checkouts * 1000, 3) if stats.checkouts else 0,
+                "max_wait_ms": round(stats.wait_max * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
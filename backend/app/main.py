@@ -1,22 +1,39 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr, validator
-from app.services.llm import PerplexityService
-from app.api import auth, experiments
+from app.services.ranking_service import ranking_service
+from app.services.experiment_cache import experiment_cache
+from app.services.idempotency import idempotency_store
+from app.services.tracking_scheduler import tracking_scheduler
+from app.services.deadline import DeadlineExceeded, deadline_scope, parse_budget, cancel_on_disconnect, remaining as deadline_remaining
+from app.services.fairness import UserQueueFull, client_scope, user_client
+from app.services.admission import admission_controller, Overloaded
+from app.services.performance_monitor import performance_monitor
+from app.services.llm_router import llm_router
+from app.services.user_cache import user_cache
+from app.services.revocation import revocation_list
+from app.services.auth_service import AuthService
+from app.services.password_hasher import password_hasher
+from app.services.concurrency import bulkheads
+from app.api import auth, experiments, tracking
 from app.models.user import User as DBUser
-from app.core.database import get_db
-from sqlalchemy.orm import Session
+from app.core.database import get_async_db, pool_stats
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Optional, Any
 from dotenv import load_dotenv
 from datetime import datetime
-from jose import JWTError, jwt
 from app.core.config import settings
 import os
+import asyncio
+import hashlib
+import base64
 
 load_dotenv()  # Load environment variables
 
 app = FastAPI()
+auth_service = AuthService()
 
 # Enhanced CORS Setup - Production-ready configuration
 # Parse CORS origins from environment variable
@@ -57,6 +74,8 @@ app.add_middleware(
         "X-Real-IP",
         "X-Forwarded-Proto",
         "X-Forwarded-Host",
+        "Idempotency-Key",
+        settings.REQUEST_DEADLINE_HEADER,
     ],
     expose_headers=[
         "Content-Type",
@@ -69,6 +88,8 @@ app.add_middleware(
         "X-Current-Page",
         "X-Per-Page",
         "X-Total-Pages",
+        "X-Next-Cursor",
+        "Idempotent-Replayed",
         "Access-Control-Allow-Origin",
         "Access-Control-Allow-Credentials",
     ],
@@ -81,6 +102,9 @@ app.include_router(auth.router, prefix="/api")
 # Include the experiments router
 app.include_router(experiments.router, prefix="/api")
 
+# Include the brand-tracking router
+app.include_router(tracking.router, prefix="/api")
+
 # Health check endpoint for debugging
 @app.get("/health")
 async def health_check():
@@ -94,43 +118,85 @@ async def health_check():
     }
 
 # Models with validation
+def validate_samples(cls, v):
+    """Self-consistency sample count: None/1 means a single deterministic call"""
+    if v is not None and not 1 <= v <= settings.CONSENSUS_MAX_SAMPLES:
+        raise ValueError(f'Samples must be between 1 and {settings.CONSENSUS_MAX_SAMPLES}')
+    return v
+
+def validate_brands(cls, v):
+    """2 to MAX_RANKING_BRANDS non-blank brand names, stripped"""
+    if v is None:
+        return v
+    if len(v) < 2:
+        raise ValueError('At least 2 brands are required')
+    if len(v) > settings.MAX_RANKING_BRANDS:
+        raise ValueError(f'Maximum {settings.MAX_RANKING_BRANDS} brands allowed')
+    for brand in v:
+        if not brand.strip():
+            raise ValueError('Brand names cannot be empty')
+        if len(brand) < 2:
+            raise ValueError('Brand names must be at least 2 characters')
+    return [brand.strip() for brand in v]
+
+def validate_categories(cls, v):
+    """1 to 3 non-blank category names, stripped"""
+    if v is None:
+        return v
+    if len(v) < 1:
+        raise ValueError('At least 1 category is required')
+    if len(v) > 3:
+        raise ValueError('Maximum 3 categories allowed')
+    for category in v:
+        if not category.strip():
+            raise ValueError('Category names cannot be empty')
+        if len(category) < 2:
+            raise ValueError('Category names must be at least 2 characters')
+    return [category.strip() for category in v]
+
 class RankingRequest(BaseModel):
     brands: List[str]
     categories: List[str]
+    samples: Optional[int] = None
     
-    @validator('brands')
-    def validate_brands(cls, v):
-        if len(v) < 2:
-            raise ValueError('At least 2 brands are required')
-        if len(v) > 5:
-            raise ValueError('Maximum 5 brands allowed')
-        for brand in v:
-            if not brand.strip():
-                raise ValueError('Brand names cannot be empty')
-            if len(brand) < 2:
-                raise ValueError('Brand names must be at least 2 characters')
-        return [brand.strip() for brand in v]
-    
-    @validator('categories')
-    def validate_categories(cls, v):
-        if len(v) < 1:
-            raise ValueError('At least 1 category is required')
-        if len(v) > 3:
-            raise ValueError('Maximum 3 categories allowed')
-        for category in v:
-            if not category.strip():
-                raise ValueError('Category names cannot be empty')
-            if len(category) < 2:
-                raise ValueError('Category names must be at least 2 characters')
-        return [category.strip() for category in v]
+    _validate_samples = validator('samples', allow_reuse=True)(validate_samples)
+    _validate_brands = validator('brands', allow_reuse=True)(validate_brands)
+    _validate_categories = validator('categories', allow_reuse=True)(validate_categories)
 
 class RankingResult(BaseModel):
     rankings: Dict[str, Dict[str, int]]  # {category: {brand: rank}}
     average_ranks: Dict[str, float]      # {brand: avg_rank}
+    agreement: Optional[Dict[str, float]] = None  # {category: kendall_tau}, self-consistency mode only
+
+class BatchRankingRequest(BaseModel):
+    jobs: List[RankingRequest]
+
+    @validator('jobs')
+    def validate_jobs(cls, v):
+        if len(v) < 1:
+            raise ValueError('At least 1 ranking job is required')
+        if len(v) > settings.RANK_BATCH_MAX_JOBS:
+            raise ValueError(f'Maximum {settings.RANK_BATCH_MAX_JOBS} ranking jobs allowed')
+        return v
 
 class ExperimentCreate(BaseModel):
     companies: List[str]
     categories: List[str]
+    samples: Optional[int] = None
+    # Return at the deadline with slow categories pending; they finish in the background
+    allow_partial: bool = False
+    
+    _validate_samples = validator('samples', allow_reuse=True)(validate_samples)
+
+class ExperimentUpdate(BaseModel):
+    companies: Optional[List[str]] = None
+    categories: Optional[List[str]] = None
+    samples: Optional[int] = None
+    
+    # Same rules as a ranking request, so a re-run can never overwrite the stored experiment with too little
+    _validate_samples = validator('samples', allow_reuse=True)(validate_samples)
+    _validate_companies = validator('companies', allow_reuse=True)(validate_brands)
+    _validate_categories = validator('categories', allow_reuse=True)(validate_categories)
 
 class ExperimentResult(BaseModel):
     id: int
@@ -139,6 +205,7 @@ class ExperimentResult(BaseModel):
     results: Dict[str, Any]  # {category: {rankings: {...}, reason: "..."}}
     average_ranks: Dict[str, float]
     created_at: str
+    pending_categories: List[str] = []  # Still being ranked in the background
 
 class ExperimentResponse(BaseModel):
     experiment: ExperimentResult
@@ -157,6 +224,18 @@ async def startup_event():
         print("✅ Database tables initialized successfully!")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
+    
+    if settings.TRACKING_SCHEDULER_ENABLED:
+        tracking_scheduler.start()
+    admission_controller.start()
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await tracking_scheduler.stop()
+    await admission_controller.stop()
+    await revocation_list.stop()
+    await llm_router.aclose()
 
 @app.middleware("http")
 async def handle_errors(request: Request, call_next):
@@ -178,6 +257,32 @@ async def handle_errors(request: Request, call_next):
             content={"error": f"Internal error: {str(e)}"}
         )
 
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    print(f"⏰ Deadline exceeded for {request.method} {request.url.path}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.exception_handler(UserQueueFull)
+async def user_queue_full_handler(request: Request, exc: UserQueueFull):
+    print(f"🚦 Per-user queue full for {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(settings.LLM_QUEUE_FULL_RETRY_AFTER)}
+    )
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after))}
+    )
+
+def request_client(request: Request) -> str:
+    """Fair-queue identity for unauthenticated endpoints"""
+    return f"ip:{request.client.host}" if request.client else "anonymous"
+
 # CORS preflight handler for all endpoints
 @app.options("/{full_path:path}")
 async def options_handler(request: Request):
@@ -214,26 +319,34 @@ async def options_handler(request: Request):
         )
 
 # Helper function to get user from token
-def get_user_from_token(request: Request, db: Session = Depends(get_db)):
+async def get_user_from_token(request: Request, db: AsyncSession = Depends(get_async_db)):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
     token = auth_header.split(" ")[1]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Fetch user from database
-        user = db.query(DBUser).filter(DBUser.username == username).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return user
-    except JWTError:
+    payload = auth_service.verify_token(token)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    username = payload.get("sub")
+    if username is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Tokens with signed user claims need no lookup; older tokens go through the cache
+    user = auth_service.user_from_claims(payload)
+    if user is not None:
+        return user
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    
+    # Fetch user from database
+    user = (await db.execute(select(DBUser).where(DBUser.username == username))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    user_cache.set(token, user, payload.get("exp"))
+    return user
 
 def validate_ranking(response: dict, brands: list, category: str) -> dict:
     """Validate LLM response and ensure all brands are ranked"""
@@ -264,61 +377,209 @@ def validate_ranking(response: dict, brands: list, category: str) -> dict:
         default_rankings = {brand: i + 1 for i, brand in enumerate(brands)}
         return {"rankings": default_rankings, "reason": f"Default rankings due to validation error: {str(e)}"}
 
+# Errors that reject the whole request (504/429/503) rather than skipping one category
+REQUEST_REJECTIONS = (DeadlineExceeded, UserQueueFull, Overloaded)
+
+async def rank_experiment_category(companies: List[str], category: str, samples: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Rank one experiment category; returns None when the category should be skipped"""
+    try:
+        print(f"🔍 Processing category: {category}")
+        response = await ranking_service.rank_category(companies, category, samples)
+        
+        # Validate the response
+        validated_response = validate_ranking(response, companies, category)
+        
+        print(f"✅ Rankings for {category}: {validated_response['rankings']}")
+        
+        # Store enhanced data including metadata
+        return {
+            "rankings": validated_response["rankings"],
+            "reason": validated_response.get("reason", ""),
+            "metadata": {**response.get("metadata", {}), "samples": samples or 1}
+        }
+    except REQUEST_REJECTIONS:
+        raise
+    except Exception as e:
+        print(f"❌ Error processing category {category}: {str(e)}")
+        print(f"❌ Error type: {type(e)}")
+        import traceback
+        print(f"❌ Full traceback: {traceback.format_exc()}")
+        # Don't raise immediately, try to continue with other categories
+        print(f"⚠️ Skipping category {category} due to error")
+        return None
+
+def compute_average_ranks(companies: List[str], category_results: Dict[str, Any]) -> Dict[str, float]:
+    """Average each company's rank across the ranked categories"""
+    brand_scores = {brand: [] for brand in companies}
+    for category_data in category_results.values():
+        # Calculate averages with case-insensitive matching
+        for response_brand, rank in category_data["rankings"].items():
+            # Find the original brand name (case-insensitive match)
+            original_brand = None
+            for input_brand in companies:
+                if input_brand.lower() == response_brand.lower():
+                    original_brand = input_brand
+                    break
+            
+            if original_brand:
+                brand_scores[original_brand].append(rank)
+            else:
+                print(f"⚠️ Warning: Could not match response brand '{response_brand}' to any input brand")
+    
+    return {brand: sum(scores) / len(scores) if scores else 0.0 for brand, scores in brand_scores.items()}
+
+def find_pending_categories(results: Optional[Dict[str, Any]]) -> List[str]:
+    return [category for category, data in (results or {}).items() if isinstance(data, dict) and data.get("status") == "pending"]
+
+# Strong references so background completions are not garbage collected mid-flight
+_background_tasks = set()
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def rank_categories_until_deadline(companies: List[str], categories: List[str], samples: Optional[int]):
+    """Rank categories concurrently until the request deadline; returns (results, pending tasks).
+    
+    The category tasks run without the request deadline so slow ones can finish
+    in the background after the response has been sent.
+    """
+    with deadline_scope(None):
+        tasks = {category: asyncio.ensure_future(rank_experiment_category(companies, category, samples)) for category in categories}
+    
+    budget = deadline_remaining()
+    if budget is not None:
+        budget = max(0.0, budget - settings.PARTIAL_RESULTS_MARGIN)
+    try:
+        # Category failures are swallowed into None, so an exception here is a request rejection
+        await asyncio.wait(tasks.values(), timeout=budget, return_when=asyncio.FIRST_EXCEPTION)
+    except asyncio.CancelledError:
+        # Client went away before the deadline - nothing will collect these
+        for task in tasks.values():
+            task.cancel()
+        raise
+    
+    rejection = next((task.exception() for task in tasks.values()
+                      if task.done() and not task.cancelled() and isinstance(task.exception(), REQUEST_REJECTIONS)), None)
+    if rejection is not None:
+        # Rejected like the non-partial path, rather than storing an experiment without the category
+        for task in tasks.values():
+            task.cancel()
+        raise rejection
+    
+    results = {}
+    pending = {}
+    for category, task in tasks.items():
+        if not task.done():
+            pending[category] = task
+            results[category] = {"rankings": {}, "reason": "", "status": "pending", "metadata": {}}
+        elif not task.cancelled() and task.exception() is None and task.result():
+            results[category] = task.result()
+    
+    if pending:
+        print(f"⏳ Deadline reached with {len(pending)} categories pending: {list(pending)}")
+    return results, pending
+
+async def complete_pending_categories(experiment_id: int, companies: List[str], pending: Dict[str, asyncio.Task], bind) -> None:
+    """Wait for pending categories and write them into the stored experiment"""
+    outcomes = await asyncio.gather(*pending.values(), return_exceptions=True)
+    finished = dict(zip(pending, outcomes))
+    
+    db = AsyncSession(bind=bind, autoflush=False, expire_on_commit=False)
+    try:
+        db_experiment = await db.get(Experiment, experiment_id)
+        # The experiment may have been deleted or re-run with other inputs meanwhile
+        if not db_experiment or sorted(db_experiment.companies) != sorted(companies):
+            return
+        
+        results = dict(db_experiment.results or {})
+        for category, outcome in finished.items():
+            if category not in find_pending_categories(results):
+                continue
+            if isinstance(outcome, dict):
+                results[category] = outcome
+            else:
+                # Failed categories are dropped, as in a synchronous run
+                results.pop(category, None)
+        
+        # Reassign JSON columns so SQLAlchemy detects the change
+        db_experiment.results = results
+        db_experiment.average_ranks = compute_average_ranks(db_experiment.companies, results)
+        await db.commit()
+        print(f"✅ Experiment {experiment_id} completed {len(finished)} pending categories in the background")
+    except Exception as e:
+        await db.rollback()
+        print(f"❌ Background completion of experiment {experiment_id} failed: {e}")
+    finally:
+        await db.close()
+
 @app.post("/api/experiments/", response_model=ExperimentResponse)
-async def create_experiment(request: ExperimentCreate, current_user: DBUser = Depends(get_user_from_token), db: Session = Depends(get_db)):
+async def create_experiment(request: ExperimentCreate, http_request: Request, http_response: Response,
+                            current_user: DBUser = Depends(get_user_from_token), db: AsyncSession = Depends(get_async_db)):
+    with deadline_scope(parse_budget(http_request.headers.get(settings.REQUEST_DEADLINE_HEADER))), \
+            client_scope(user_client(current_user.id)):
+        return await create_experiment_within_deadline(request, http_request, http_response, current_user, db)
+
+async def create_experiment_within_deadline(request: ExperimentCreate, http_request: Request, http_response: Response,
+                                            current_user: DBUser, db: AsyncSession):
+    idempotency_key = http_request.headers.get("Idempotency-Key")
+    if not idempotency_key:
+        return await cancel_on_disconnect(http_request, run_experiment(request, current_user, db))
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    
+    # Keys are scoped per user; the body fingerprint catches a key reused for a different request.
+    # Keyed requests keep running after a disconnect so the client's retry can pick up the result.
+    fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+    
+    async def handler():
+        experiment_response = await run_experiment(request, current_user, db)
+        return experiment_response.model_dump(mode="json")
+    
+    payload, replayed = await idempotency_store.run(f"{current_user.id}:{idempotency_key}", fingerprint, handler)
+    if replayed:
+        print(f"🔁 Replayed experiment response for Idempotency-Key {idempotency_key}")
+        http_response.headers["Idempotent-Replayed"] = "true"
+    return payload
+
+async def run_experiment(request: ExperimentCreate, current_user: DBUser, db: AsyncSession) -> ExperimentResponse:
     print(f"🚀 Creating experiment for user: {current_user.username} (ID: {current_user.id})")
     print(f"🔍 Companies: {request.companies}")
     print(f"🔍 Categories: {request.categories}")
     
-    llm = PerplexityService()
-    results = {"rankings": {}, "average_ranks": {}}
-    brand_scores = {brand: [] for brand in request.companies}
-    
-    for category in request.categories:
+    pending = {}
+    cached = experiment_cache.get(request.companies, request.categories, request.samples)
+    if cached:
+        print(f"⚡ Experiment cache hit for {len(request.companies)} companies x {len(request.categories)} categories")
+        results = {"rankings": cached["results"], "average_ranks": cached["average_ranks"]}
+    else:
+        admission_controller.check()
+        results = {"rankings": {}, "average_ranks": {}}
+        # Categories left pending keep running upstream, so the experiment stays counted until they finish
+        admission_controller.begin_experiment()
         try:
-            print(f"🔍 Processing category: {category}")
-            response = llm.get_rankings(request.companies, category)
-            
-            # Validate the response
-            validated_response = validate_ranking(response, request.companies, category)
-            
-            # Store enhanced data including metadata
-            category_data = {
-                "rankings": validated_response["rankings"],
-                "reason": validated_response.get("reason", ""),
-                "metadata": response.get("metadata", {})
-            }
-            
-            results["rankings"][category] = category_data
-            
-            print(f"✅ Rankings for {category}: {validated_response['rankings']}")
-            
-            # Calculate averages with case-insensitive matching
-            for response_brand, rank in validated_response["rankings"].items():
-                # Find the original brand name (case-insensitive match)
-                original_brand = None
-                for input_brand in request.companies:
-                    if input_brand.lower() == response_brand.lower():
-                        original_brand = input_brand
-                        break
-                
-                if original_brand:
-                    brand_scores[original_brand].append(rank)
-                else:
-                    print(f"⚠️ Warning: Could not match response brand '{response_brand}' to any input brand")
-                
-        except Exception as e:
-            print(f"❌ Error processing category {category}: {str(e)}")
-            print(f"❌ Error type: {type(e)}")
-            import traceback
-            print(f"❌ Full traceback: {traceback.format_exc()}")
-            # Don't raise immediately, try to continue with other categories
-            print(f"⚠️ Skipping category {category} due to error")
-            continue
-    
-    # Compute average ranks
-    for brand, scores in brand_scores.items():
-        results["average_ranks"][brand] = sum(scores) / len(scores) if scores else 0.0
+            if request.allow_partial:
+                results["rankings"], pending = await rank_categories_until_deadline(
+                    request.companies, request.categories, request.samples
+                )
+            else:
+                for category in request.categories:
+                    category_data = await rank_experiment_category(request.companies, category, request.samples)
+                    if category_data:
+                        results["rankings"][category] = category_data
+        finally:
+            admission_controller.end_experiment_after(pending.values())
+        
+        results["average_ranks"] = compute_average_ranks(request.companies, results["rankings"])
+        
+        # Only cache complete experiments so a skipped category is retried next time
+        if len(results["rankings"]) == len(request.categories) and not pending:
+            experiment_cache.set(request.companies, request.categories, request.samples, {
+                "results": results["rankings"],
+                "average_ranks": results["average_ranks"],
+            })
     
     # Create experiment in database
     db_experiment = Experiment(
@@ -330,8 +591,11 @@ async def create_experiment(request: ExperimentCreate, current_user: DBUser = De
     )
     
     db.add(db_experiment)
-    db.commit()
-    db.refresh(db_experiment)
+    await db.commit()
+    await db.refresh(db_experiment)
+    
+    if pending:
+        run_in_background(complete_pending_categories(db_experiment.id, request.companies, pending, db.bind))
     
     # Create response object
     experiment = ExperimentResult(
@@ -340,44 +604,85 @@ async def create_experiment(request: ExperimentCreate, current_user: DBUser = De
         categories=request.categories,
         results=results["rankings"],
         average_ranks=results["average_ranks"],
-        created_at=db_experiment.created_at.isoformat()
+        created_at=db_experiment.created_at.isoformat(),
+        pending_categories=list(pending)
     )
     
     print(f"✅ Experiment {db_experiment.id} stored in database successfully")
     
     return ExperimentResponse(
         experiment=experiment,
-        message="Experiment created successfully"
+        message=f"Experiment created with {len(pending)} categories pending" if pending else "Experiment created successfully"
     )
 
+def encode_cursor(experiment_id: int) -> str:
+    return base64.urlsafe_b64encode(str(experiment_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @app.get("/api/experiments/", response_model=List[ExperimentResult])
-async def get_experiments(current_user: DBUser = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    # Get experiments from database for the current user
+async def get_experiments(http_response: Response, cursor: Optional[str] = None,
+                          limit: int = Query(settings.EXPERIMENTS_PAGE_SIZE, ge=1, le=settings.EXPERIMENTS_MAX_PAGE_SIZE),
+                          current_user: DBUser = Depends(get_user_from_token), db: AsyncSession = Depends(get_async_db)):
+    # Newest first, one page at a time. The cursor names the last experiment of the previous
+    # page; rows sorting after it on (created_at, id) are read straight off the user's index,
+    # so a page costs the same however long the history is. Totals are only counted for the
+    # first page.
     print(f"🔍 Getting experiments for user: {current_user.username} (ID: {current_user.id})")
     
-    db_experiments = db.query(Experiment).filter(Experiment.user_id == current_user.id).order_by(Experiment.created_at.desc()).all()
-    print(f"🔍 Found {len(db_experiments)} experiments in database")
+    owned = Experiment.user_id == current_user.id
+    statement = select(Experiment).where(owned)
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        # The anchor must still exist and belong to the user - otherwise the keyset has nothing to compare against
+        if await db.scalar(select(Experiment.id).where(owned, Experiment.id == after_id)) is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Compare against the stored timestamp rather than a re-bound copy of it, which
+        # SQLite would format differently from its CURRENT_TIMESTAMP defaults
+        after_created = select(Experiment.created_at).where(Experiment.id == after_id).scalar_subquery()
+        statement = statement.where(or_(
+            Experiment.created_at < after_created,
+            and_(Experiment.created_at == after_created, Experiment.id < after_id),
+        ))
+    statement = statement.order_by(Experiment.created_at.desc(), Experiment.id.desc()).limit(limit + 1)
     
-    user_experiments = []
-    for db_exp in db_experiments:
-        experiment = ExperimentResult(
+    db_experiments = (await db.execute(statement)).scalars().all()
+    
+    page = db_experiments[:limit]
+    if len(db_experiments) > limit:
+        http_response.headers["X-Next-Cursor"] = encode_cursor(page[-1].id)
+    if cursor is None:
+        total = (await db.execute(select(func.count()).select_from(Experiment).where(owned))).scalar_one()
+        http_response.headers["X-Total-Count"] = str(total)
+        http_response.headers["X-Page-Count"] = str(-(-total // limit))
+    http_response.headers["X-Per-Page"] = str(limit)
+    
+    user_experiments = [
+        ExperimentResult(
             id=db_exp.id,
             companies=db_exp.companies,
             categories=db_exp.categories,
             results=db_exp.results,
             average_ranks=db_exp.average_ranks,
-            created_at=db_exp.created_at.isoformat()
+            created_at=db_exp.created_at.isoformat(),
+            pending_categories=find_pending_categories(db_exp.results)
         )
-        user_experiments.append(experiment)
-        print(f"✅ Added experiment {db_exp.id} to user's list")
+        for db_exp in page
+    ]
     
     print(f"✅ Returning {len(user_experiments)} experiments for user {current_user.username}")
     return user_experiments
 
 @app.get("/api/experiments/{experiment_id}", response_model=ExperimentResult)
-async def get_experiment(experiment_id: int, current_user: DBUser = Depends(get_user_from_token), db: Session = Depends(get_db)):
+async def get_experiment(experiment_id: int, current_user: DBUser = Depends(get_user_from_token), db: AsyncSession = Depends(get_async_db)):
     # Get experiment from database
-    db_experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
+    db_experiment = await db.get(Experiment, experiment_id)
     
     if not db_experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
@@ -392,49 +697,140 @@ async def get_experiment(experiment_id: int, current_user: DBUser = Depends(get_
         categories=db_experiment.categories,
         results=db_experiment.results,
         average_ranks=db_experiment.average_ranks,
-        created_at=db_experiment.created_at.isoformat()
+        created_at=db_experiment.created_at.isoformat(),
+        pending_categories=find_pending_categories(db_experiment.results)
     )
     
     return experiment
 
+def stored_samples(category_data: Dict[str, Any]) -> int:
+    """Sample count a stored category result was ranked with"""
+    metadata = category_data.get("metadata") or {}
+    return metadata.get("samples") or metadata.get("samples_requested") or 1
+
+@app.patch("/api/experiments/{experiment_id}", response_model=ExperimentResponse)
+async def update_experiment(experiment_id: int, request: ExperimentUpdate, http_request: Request, current_user: DBUser = Depends(get_user_from_token), db: AsyncSession = Depends(get_async_db)):
+    """Re-run an experiment with new inputs, recomputing only the categories whose inputs changed"""
+    with deadline_scope(parse_budget(http_request.headers.get(settings.REQUEST_DEADLINE_HEADER))), \
+            client_scope(user_client(current_user.id)):
+        return await cancel_on_disconnect(http_request, rerun_experiment(experiment_id, request, current_user, db))
+
+async def rerun_experiment(experiment_id: int, request: ExperimentUpdate, current_user: DBUser, db: AsyncSession) -> ExperimentResponse:
+    db_experiment = await db.get(Experiment, experiment_id)
+    
+    if not db_experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    
+    if db_experiment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    stored_results = db_experiment.results or {}
+    companies = request.companies if request.companies is not None else db_experiment.companies
+    categories = request.categories if request.categories is not None else db_experiment.categories
+    if request.samples is not None:
+        samples = request.samples
+    else:
+        samples = max((stored_samples(data) for data in stored_results.values()), default=1)
+    
+    # A category's inputs are the company set and sample count; its name is the key
+    same_companies = sorted(companies) == sorted(db_experiment.companies or [])
+    reused = [
+        category for category in categories
+        if same_companies and stored_results.get(category)
+        and stored_results[category].get("status") != "pending"
+        and stored_samples(stored_results[category]) == samples
+    ]
+    if len(reused) < len(categories):
+        admission_controller.check()
+    
+    results = {}
+    with admission_controller.track_experiment():
+        for category in categories:
+            if category in reused:
+                results[category] = stored_results[category]
+                continue
+            category_data = await rank_experiment_category(companies, category, samples)
+            if category_data:
+                results[category] = category_data
+    
+    print(f"♻️ Experiment {experiment_id}: reused {len(reused)} categories, recomputed {len(categories) - len(reused)}")
+    
+    average_ranks = compute_average_ranks(companies, results)
+    if len(results) == len(categories):
+        experiment_cache.set(companies, categories, samples, {"results": results, "average_ranks": average_ranks})
+    
+    # Reassign JSON columns so SQLAlchemy detects the change
+    db_experiment.companies = list(companies)
+    db_experiment.categories = list(categories)
+    db_experiment.results = results
+    db_experiment.average_ranks = average_ranks
+    await db.commit()
+    await db.refresh(db_experiment)
+    
+    experiment = ExperimentResult(
+        id=db_experiment.id,
+        companies=db_experiment.companies,
+        categories=db_experiment.categories,
+        results=db_experiment.results,
+        average_ranks=db_experiment.average_ranks,
+        created_at=db_experiment.created_at.isoformat(),
+        pending_categories=find_pending_categories(db_experiment.results)
+    )
+    
+    return ExperimentResponse(
+        experiment=experiment,
+        message=f"Experiment updated successfully ({len(reused)} of {len(categories)} categories reused)"
+    )
+
 @app.post("/rank", response_model=RankingResult)
-async def rank_brands(request: RankingRequest):
-    llm = PerplexityService()
-    results = {"rankings": {}, "average_ranks": {}}
-    brand_scores = {brand: [] for brand in request.brands}
+async def rank_brands(request: RankingRequest, http_request: Request):
+    try:
+        with deadline_scope(parse_budget(http_request.headers.get(settings.REQUEST_DEADLINE_HEADER))), \
+                client_scope(request_client(http_request)), admission_controller.guard():
+            return await cancel_on_disconnect(
+                http_request, ranking_service.rank(request.brands, request.categories, request.samples)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    for category in request.categories:
-        try:
-            response = llm.get_rankings(request.brands, category)
-            results["rankings"][category] = response["rankings"]
-            
-            # Calculate averages with case-insensitive matching
-            for response_brand, rank in response["rankings"].items():
-                # Find the original brand name (case-insensitive match)
-                original_brand = None
-                for input_brand in request.brands:
-                    if input_brand.lower() == response_brand.lower():
-                        original_brand = input_brand
-                        break
-                
-                if original_brand:
-                    brand_scores[original_brand].append(rank)
-                else:
-                    print(f"⚠️ Warning: Could not match response brand '{response_brand}' to any input brand")
-                
-        except ValueError as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    # Compute average ranks
-    for brand, scores in brand_scores.items():
-        results["average_ranks"][brand] = sum(scores) / len(scores) if scores else 0.0
-    
-    return results
+@app.post("/rank/batch")
+async def rank_brands_batch(request: BatchRankingRequest, http_request: Request):
+    """Rank many brand sets in one request, streaming NDJSON lines as jobs complete"""
+    jobs = [{"brands": job.brands, "categories": job.categories, "samples": job.samples} for job in request.jobs]
+    # Admit or shed the whole batch before any of it goes upstream; once admitted it
+    # counts as in-flight expensive work until the stream ends
+    admission_controller.check()
+    
+    async def admitted_batch():
+        with admission_controller.track_experiment():
+            async for line in ranking_service.rank_batch(jobs, client=request_client(http_request)):
+                yield line
+    
+    return StreamingResponse(admitted_batch(), media_type="application/x-ndjson")
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Service metrics: request performance, upstream concurrency and ranking reuse"""
+    return {
+        "performance": performance_monitor.get_performance_stats(),
+        "ranking": ranking_service.get_stats(),
+        "experiment_cache": experiment_cache.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "tracking": tracking_scheduler.get_stats(),
+        "admission": admission_controller.get_stats(),
+        "auth_cache": user_cache.get_stats(),
+        "auth_revocation": revocation_list.get_stats(),
+        "password_hashing": password_hasher.get_stats(),
+        "database_pools": pool_stats(),
+        "bulkheads": {name: limiter.get_stats() for name, limiter in bulkheads.items()},
+        "llm_providers": llm_router.get_stats(),
+        "llm_retries": llm_router.get_retry_stats(),
+    }
+
 @app.post("/init-db")
 async def init_database():
     """Initialize database tables manually"""
@@ -2,8 +2,9 @@ from sqlalchemy.orm import relationship
 from ..core.database import Base
 from .user import User
 from .experiment import Experiment, ExperimentResult
+from .tracking import TrackedExperiment, TrackedSnapshot
 
 # Add relationship
 User.experiments = relationship("Experiment", back_populates="user")
 
-__all__ = ["Base", "User", "Experiment", "ExperimentResult"] 
\ No newline at end of file
+__all__ = ["Base", "User", "Experiment", "ExperimentResult", "TrackedExperiment", "TrackedSnapshot"] 
\ No newline at end of file
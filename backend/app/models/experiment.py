@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -25,6 +25,9 @@ class Experiment(Base):
     # Relationships
     user = relationship("User", back_populates="experiments")
 
+    # Serves the newest-first keyset pages of a user's history
+    __table_args__ = (Index("ix_experiments_user_created", "user_id", "created_at", "id"),)
+
 
 class ExperimentResult(Base):
     __tablename__ = "experiment_results"
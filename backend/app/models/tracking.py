@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, JSON, DateTime, ForeignKey, Boolean, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class TrackedExperiment(Base):
+    __tablename__ = "tracked_experiments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String(255), nullable=True)
+    companies = Column(JSON)  # List of company names
+    categories = Column(JSON)  # List of category names
+    interval_seconds = Column(Integer, nullable=False)  # Refresh cadence
+    is_active = Column(Boolean, default=True)
+    latest_rankings = Column(JSON, default=dict)  # {category: {brand: rank}} as of the last run
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    next_run_at = Column(DateTime(timezone=True), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    snapshots = relationship(
+        "TrackedSnapshot",
+        back_populates="tracked_experiment",
+        cascade="all, delete-orphan",
+        order_by="TrackedSnapshot.run_at",
+    )
+
+
+class TrackedSnapshot(Base):
+    """Rank changes from one scheduled run; the first run stores the full rankings"""
+
+    __tablename__ = "tracked_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tracked_experiment_id = Column(Integer, ForeignKey("tracked_experiments.id"), index=True)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    changes = Column(JSON)  # {category: {brand: rank}} - only ranks that moved
+
+    # Relationships
+    tracked_experiment = relationship("TrackedExperiment", back_populates="snapshots")
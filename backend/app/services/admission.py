@@ -0,0 +1,152 @@
+import asyncio
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterable, Iterator, Optional
+from collections import defaultdict
+from ..core.config import settings
+from .concurrency import upstream_limiter, ConcurrencyLimiter
+
+# Weight of the newest sample in the event-loop lag moving average
+LAG_EWMA_ALPHA = 0.3
+
+# Set by routes whose upstream calls are admitted lazily, so cache hits skip admission
+_guarded: ContextVar[bool] = ContextVar("admission_guarded", default=False)
+
+
+class Overloaded(Exception):
+    """The server is saturated and sheds new expensive work"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason}), retry later")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Rejects expensive requests up front while the server is saturated.
+
+    Three signals are checked: experiments already in flight, how long
+    upstream calls currently wait for a slot, and event-loop lag. Callers
+    check admission only once they know a request needs upstream work, so
+    cached reads are served even under overload.
+    """
+
+    def __init__(self, limiter: ConcurrencyLimiter = None, max_experiments: int = None,
+                 max_queue_wait: float = None, max_loop_lag: float = None,
+                 retry_after: float = None, lag_interval: float = None):
+        self.limiter = limiter or upstream_limiter
+        self.max_experiments = settings.ADMISSION_MAX_EXPERIMENTS if max_experiments is None else max_experiments
+        self.max_queue_wait = settings.ADMISSION_MAX_QUEUE_WAIT if max_queue_wait is None else max_queue_wait
+        self.max_loop_lag = settings.ADMISSION_MAX_LOOP_LAG if max_loop_lag is None else max_loop_lag
+        self.retry_after = settings.ADMISSION_RETRY_AFTER if retry_after is None else retry_after
+        self.lag_interval = settings.ADMISSION_LAG_INTERVAL if lag_interval is None else lag_interval
+        self._experiments_in_flight = 0
+        self._loop_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.lock = threading.Lock()
+        # Reporting
+        self.admitted = 0
+        self.shed = defaultdict(int)
+
+    def begin_experiment(self) -> None:
+        """Count an experiment as in flight until end_experiment"""
+        with self.lock:
+            self._experiments_in_flight += 1
+
+    def end_experiment(self) -> None:
+        with self.lock:
+            self._experiments_in_flight -= 1
+
+    def end_experiment_after(self, tasks: Iterable[asyncio.Future]) -> None:
+        """End an experiment once its remaining tasks are done - right away when there are none"""
+        tasks = list(tasks)
+        if not tasks:
+            self.end_experiment()
+            return
+        asyncio.gather(*tasks, return_exceptions=True).add_done_callback(lambda _: self.end_experiment())
+
+    @contextmanager
+    def track_experiment(self) -> Iterator[None]:
+        """Count an experiment as in flight for the duration of the block"""
+        self.begin_experiment()
+        try:
+            yield
+        finally:
+            self.end_experiment()
+
+    def observe_loop_lag(self, lag: float) -> None:
+        with self.lock:
+            self._loop_lag += LAG_EWMA_ALPHA * (max(0.0, lag) - self._loop_lag)
+
+    def _overload_reason(self) -> Optional[str]:
+        if self._experiments_in_flight >= self.max_experiments:
+            return "experiments"
+        if self.limiter.queue_wait() >= self.max_queue_wait:
+            return "queue_wait"
+        if self._loop_lag >= self.max_loop_lag:
+            return "loop_lag"
+        return None
+
+    def check(self) -> None:
+        """Admit one unit of expensive work or raise Overloaded"""
+        with self.lock:
+            reason = self._overload_reason()
+            if reason is None:
+                self.admitted += 1
+                return
+            self.shed[reason] += 1
+        print(f"🛑 Shedding request: {reason}")
+        raise Overloaded(reason, self.retry_after)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Check admission before each upstream call made in the block"""
+        token = _guarded.set(True)
+        try:
+            yield
+        finally:
+            _guarded.reset(token)
+
+    def check_guarded(self) -> None:
+        if _guarded.get():
+            self.check()
+
+    async def _monitor_loop_lag(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            self.observe_loop_lag(time.monotonic() - started - self.lag_interval)
+
+    def start(self) -> None:
+        """Start sampling event-loop lag on the running loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._monitor_loop_lag())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission signals and shed counts"""
+        with self.lock:
+            return {
+                "experiments_in_flight": self._experiments_in_flight,
+                "max_experiments": self.max_experiments,
+                "queue_wait": round(self.limiter.queue_wait(), 4),
+                "max_queue_wait": self.max_queue_wait,
+                "loop_lag": round(self._loop_lag, 4),
+                "max_loop_lag": self.max_loop_lag,
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+            }
+
+
+# Global instance guarding the expensive routes
+admission_controller = AdmissionController()
@@ -1,10 +1,12 @@
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from ..core.config import settings
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..models.user import User
+from .revocation import revocation_list
+from .password_hasher import pwd_context, password_hasher
 
 
 class AuthService:
@@ -19,19 +21,45 @@ class AuthService:
     def get_password_hash(self, password: str) -> str:
         return pwd_context.hash(password)
     
+    async def hash_password(self, password: str) -> str:
+        """Hash on the bounded bcrypt pool"""
+        return await password_hasher.hash(password)
+    
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify on the bounded bcrypt pool; also returns a new hash if the work factor changed"""
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        to_encode.update({"exp": expire})
+        # iat keeps sub-second precision so a user cutoff never catches a token issued right after it
+        to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
     
+    def create_user_token(self, user: User) -> str:
+        """Access token carrying the user fields authenticated routes need as signed claims"""
+        return self.create_access_token(data={"sub": user.username, "uid": user.id, "active": bool(user.is_active)})
+    
     def verify_token(self, token: str) -> Optional[dict]:
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
         except JWTError:
-            return None 
\ No newline at end of file
+            return None
+        if revocation_list.is_revoked(payload):
+            return None
+        return payload
+    
+    @staticmethod
+    def user_from_claims(payload: dict) -> Optional[User]:
+        """Detached user built from signed claims, or None for tokens issued without them"""
+        if "uid" not in payload or "sub" not in payload:
+            return None
+        return User(id=payload["uid"], username=payload["sub"], is_active=payload.get("active", True))
+    
+    def revoke_token(self, payload: dict) -> None:
+        if payload.get("jti"):
+            revocation_list.revoke(payload["jti"], payload.get("exp") or time.time()) 
\ No newline at end of file
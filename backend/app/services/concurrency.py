@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional
+from ..core.config import settings
+from .priority import INTERACTIVE, BATCH, LANES, current_lane, parse_lane_weights
+from .fairness import DRRQueue, UserQueueFull, current_client
+
+# Weight of the newest sample in the queue-wait moving average
+WAIT_EWMA_ALPHA = 0.2
+
+# Traffic classes, each with its own bulkhead (see the bottom of this module)
+RANKING = "ranking"
+VALIDATION = "validation"
+
+# Traffic class of the upstream calls made in this context; providers and key pools
+# keep part of their capacity for ranking when it is anything else
+_traffic: ContextVar[str] = ContextVar("traffic_class", default=RANKING)
+
+
+def current_traffic() -> str:
+    return _traffic.get()
+
+
+@contextmanager
+def traffic_scope(traffic: str) -> Iterator[None]:
+    """Tag the upstream calls made in the block with a traffic class"""
+    token = _traffic.set(traffic)
+    try:
+        yield
+    finally:
+        _traffic.reset(token)
+
+
+class ConcurrencyLimiter:
+    """Caps the number of concurrent upstream LLM calls shared by every route.
+
+    Waiters queue per priority lane (see services.priority). When a slot frees
+    up it goes to the next lane picked by smooth weighted round-robin among
+    lanes with waiters, so low-priority work soaks up spare capacity without
+    crowding out interactive calls. `reserved_slots` are kept for the
+    interactive lane only, so it never waits behind a full house of batch work.
+
+    Within a lane, clients (see services.fairness) are served by deficit
+    round-robin, each holding at most `per_client_concurrency` slots and
+    queueing at most `per_client_queue` calls.
+
+    Waiters are plain futures created on the running loop, so a single global
+    instance works across event loops (uvicorn workers, test clients).
+    """
+
+    def __init__(self, max_concurrency: int, lane_weights: Optional[Dict[str, int]] = None, reserved_slots: int = 0,
+                 per_client_concurrency: Optional[int] = None, per_client_queue: Optional[int] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.lane_weights = lane_weights or {}
+        # Always leave at least one slot that any lane can use
+        self.reserved_slots = max(0, min(reserved_slots, self.max_concurrency - 1))
+        self.per_client_concurrency = per_client_concurrency or self.max_concurrency
+        self.per_client_queue = per_client_queue
+        self._in_flight = 0
+        self._lane_in_flight = defaultdict(int)
+        self._client_in_flight = defaultdict(int)
+        self._waiters: Dict[str, DRRQueue] = defaultdict(DRRQueue)
+        self._wrr_current = defaultdict(int)
+        self._granted = set()
+        self._acquired_total = 0
+        self._queued_total = 0
+        self._lane_acquired = defaultdict(int)
+        self._rejected_total = 0
+        # Queue wait: moving average of granted calls plus the age of the oldest waiter
+        self._wait_ewma = 0.0
+        self._enqueued_at: Dict[asyncio.Future, float] = {}
+        self.lock = threading.Lock()
+
+    def _capacity(self, lane: str) -> int:
+        return self.max_concurrency if lane == INTERACTIVE else self.max_concurrency - self.reserved_slots
+
+    def _grant(self, lane: str, client: str) -> None:
+        self._in_flight += 1
+        self._lane_in_flight[lane] += 1
+        self._client_in_flight[client] += 1
+        self._acquired_total += 1
+        self._lane_acquired[lane] += 1
+
+    def _client_eligible(self, client: str) -> bool:
+        return self._client_in_flight[client] < self.per_client_concurrency
+
+    def _record_wait(self, seconds: float) -> None:
+        self._wait_ewma += WAIT_EWMA_ALPHA * (seconds - self._wait_ewma)
+
+    def _try_acquire(self, lane: str, client: str) -> bool:
+        with self.lock:
+            if (self._in_flight < self._capacity(lane) and self._client_eligible(client)
+                    and not self._waiters[lane].depth(client)):
+                self._grant(lane, client)
+                self._record_wait(0.0)
+                return True
+            return False
+
+    def queue_wait(self) -> float:
+        """Recent seconds spent waiting for a slot, counting calls still queued"""
+        with self.lock:
+            oldest = min(self._enqueued_at.values(), default=None)
+            current = time.monotonic() - oldest if oldest is not None else 0.0
+            return max(self._wait_ewma, current)
+
+    def _lane_has_eligible(self, lane: str) -> bool:
+        return any(self._client_eligible(client) for client in self._waiters[lane].depths())
+
+    def _next_lane(self) -> Optional[str]:
+        """Smooth weighted round-robin over lanes that have startable waiters and room"""
+        eligible = [
+            lane for lane in list(self._waiters)
+            if self._in_flight < self._capacity(lane) and self._lane_has_eligible(lane)
+        ]
+        if not eligible:
+            return None
+        total = 0
+        for lane in eligible:
+            weight = self.lane_weights.get(lane, 1)
+            self._wrr_current[lane] += weight
+            total += weight
+        chosen = max(eligible, key=lambda lane: self._wrr_current[lane])
+        self._wrr_current[chosen] -= total
+        return chosen
+
+    async def acquire(self, lane: str = None, client: str = None) -> None:
+        """Wait for a free upstream slot in the given (or current) priority lane and client"""
+        lane = lane or current_lane()
+        client = client or current_client()
+        if self._try_acquire(lane, client):
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        with self.lock:
+            # Batch requests are already bounded by their own job cap
+            if self.per_client_queue is not None and lane != BATCH:
+                queued = sum(queue.depth(client) for queue in self._waiters.values())
+                if queued >= self.per_client_queue:
+                    self._rejected_total += 1
+                    raise UserQueueFull(f"Too many queued upstream calls for {client}")
+            self._waiters[lane].push(client, waiter)
+            self._enqueued_at[waiter] = time.monotonic()
+            self._queued_total += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self.lock:
+                granted = waiter in self._granted
+                self._granted.discard(waiter)
+                self._enqueued_at.pop(waiter, None)
+                if not granted:
+                    self._waiters[lane].remove(client, waiter)
+            if granted:
+                # The slot was handed over just before cancellation - give it back
+                self.release(lane, client)
+            raise
+        with self.lock:
+            self._granted.discard(waiter)
+            self._record_wait(time.monotonic() - self._enqueued_at.pop(waiter))
+
+    def release(self, lane: str = None, client: str = None) -> None:
+        """Free a slot and hand it to the next waiter, if any"""
+        lane = lane or current_lane()
+        client = client or current_client()
+        with self.lock:
+            self._in_flight -= 1
+            self._lane_in_flight[lane] -= 1
+            self._client_in_flight[client] -= 1
+            if not self._client_in_flight[client]:
+                del self._client_in_flight[client]
+            while True:
+                next_lane = self._next_lane()
+                if next_lane is None:
+                    return
+                next_client, waiter = self._waiters[next_lane].pop(self._client_eligible)
+                if not waiter.done():
+                    # Slot ownership transfers directly to the waiter
+                    self._grant(next_lane, next_client)
+                    self._granted.add(waiter)
+                    waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+                    return
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(True)
+
+    @asynccontextmanager
+    async def slot(self, lane: str = None, client: str = None):
+        """Hold an upstream slot for the duration of the block"""
+        lane = lane or current_lane()
+        client = client or current_client()
+        await self.acquire(lane, client)
+        try:
+            yield
+        finally:
+            self.release(lane, client)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter utilization statistics"""
+        with self.lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "utilization": round(self._in_flight / self.max_concurrency, 4),
+                "waiting": sum(len(waiters) for waiters in self._waiters.values()),
+                "queued_total": self._queued_total,
+                "queue_wait_ewma": round(self._wait_ewma, 4),
+                "acquired_total": self._acquired_total,
+                "rejected_total": self._rejected_total,
+                "reserved_interactive_slots": self.reserved_slots,
+                "per_client_concurrency": self.per_client_concurrency,
+                "lanes": {
+                    lane: {
+                        "weight": self.lane_weights.get(lane, 1),
+                        "in_flight": self._lane_in_flight[lane],
+                        "waiting": len(self._waiters[lane]),
+                        "acquired_total": self._lane_acquired[lane],
+                    }
+                    for lane in LANES
+                },
+                "clients": self._client_stats(),
+            }
+
+    def _client_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-client in-flight calls and queue depth, for clients with any activity"""
+        clients = defaultdict(lambda: {"in_flight": 0, "waiting": 0})
+        for client, in_flight in self._client_in_flight.items():
+            clients[client]["in_flight"] = in_flight
+        for queue in self._waiters.values():
+            for client, depth in queue.depths().items():
+                clients[client]["waiting"] += depth
+        return dict(clients)
+
+
+# Bulkheads: each traffic class gets its own pool of upstream slots, so a spike
+# in one class cannot take the capacity another relies on.
+# Ranking pool - experiments, /rank, batches and tracked refreshes
+upstream_limiter = ConcurrencyLimiter(
+    settings.LLM_MAX_CONCURRENCY,
+    lane_weights=parse_lane_weights(settings.LLM_LANE_WEIGHTS),
+    reserved_slots=settings.LLM_INTERACTIVE_RESERVED_SLOTS,
+    per_client_concurrency=settings.LLM_PER_USER_CONCURRENCY,
+    per_client_queue=settings.LLM_PER_USER_QUEUE,
+)
+
+# Validation pool - form validation calls
+validation_limiter = ConcurrencyLimiter(settings.VALIDATION_MAX_CONCURRENCY)
+
+bulkheads = {RANKING: upstream_limiter, VALIDATION: validation_limiter}
@@ -0,0 +1,96 @@
+import asyncio
+from itertools import combinations
+from typing import List, Dict, Any, Callable, Awaitable
+from .deadline import DeadlineExceeded
+from .fairness import UserQueueFull
+from .admission import Overloaded
+
+RankSample = Callable[[List[str], str, int], Awaitable[Dict[str, Any]]]
+
+
+def _rank_lookup(brands: List[str], rankings: Dict[str, Any]) -> Dict[str, float]:
+    """Map each input brand to its rank (case-insensitive); unranked brands tie for last"""
+    ranks = {brand.lower(): rank for brand, rank in rankings.items() if isinstance(rank, (int, float))}
+    return {brand: ranks.get(brand.lower(), len(brands) + 1) for brand in brands}
+
+
+def kendall_tau(brands: List[str], first: Dict[str, Any], second: Dict[str, Any]) -> float:
+    """Kendall rank correlation between two {brand: rank} rankings, in [-1, 1]"""
+    a, b = _rank_lookup(brands, first), _rank_lookup(brands, second)
+    pairs = list(combinations(brands, 2))
+    if not pairs:
+        return 1.0
+    score = 0
+    for x, y in pairs:
+        direction = (a[x] - a[y]) * (b[x] - b[y])
+        score += (direction > 0) - (direction < 0)
+    return score / len(pairs)
+
+
+def mean_agreement(brands: List[str], samples: List[Dict[str, Any]]) -> float:
+    """Average pairwise Kendall tau across samples"""
+    pairs = list(combinations(samples, 2))
+    if not pairs:
+        return 1.0
+    return sum(kendall_tau(brands, x["rankings"], y["rankings"]) for x, y in pairs) / len(pairs)
+
+
+def consensus_rankings(brands: List[str], samples: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Borda consensus: order brands by mean rank across samples"""
+    lookups = [_rank_lookup(brands, sample["rankings"]) for sample in samples]
+    mean_rank = {brand: sum(lookup[brand] for lookup in lookups) / len(lookups) for brand in brands}
+    ordered = sorted(brands, key=lambda brand: mean_rank[brand])
+    return {brand: position + 1 for position, brand in enumerate(ordered)}
+
+
+class ConsensusRanker:
+    """Self-consistency ranking: K parallel samples, stopping once they agree.
+
+    All K samples are launched together; as each completes, the mean pairwise
+    Kendall tau of the finished ones is checked and the rest are cancelled as
+    soon as it reaches the agreement threshold.
+    """
+
+    def __init__(self, rank_sample: RankSample, threshold: float = 0.8, min_samples: int = 3):
+        self.rank_sample = rank_sample
+        self.threshold = threshold
+        self.min_samples = max(2, min_samples)
+
+    async def rank(self, brands: List[str], category: str, samples: int) -> Dict[str, Any]:
+        """Produce a consensus ranking with its agreement score"""
+        tasks = [asyncio.ensure_future(self.rank_sample(brands, category, index)) for index in range(samples)]
+        completed = []
+        errors = []
+        agreement = 1.0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    completed.append(await next_done)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                agreement = mean_agreement(brands, completed)
+                if len(completed) >= min(self.min_samples, samples) and agreement >= self.threshold:
+                    break
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if not completed:
+            for error in errors:
+                if isinstance(error, (DeadlineExceeded, UserQueueFull, Overloaded)):
+                    raise error
+            raise ValueError(f"All {samples} ranking samples failed: {errors[0] if errors else 'unknown error'}")
+
+        return {
+            "rankings": consensus_rankings(brands, completed),
+            "reason": completed[0].get("reason", ""),
+            "metadata": {
+                "strategy": "self_consistency",
+                "agreement": round(agreement, 4),
+                "samples_used": len(completed),
+                "samples_requested": samples,
+                "early_stopped": len(completed) + len(errors) < samples,
+            },
+        }
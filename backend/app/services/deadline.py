@@ -0,0 +1,85 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Awaitable, TypeVar, Iterator
+from fastapi import Request
+from ..core.config import settings
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline of the current request, None when unbounded
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's latency budget ran out before the work finished"""
+
+
+def parse_budget(value: Optional[str]) -> float:
+    """Seconds of budget from the deadline header, falling back to the default and capped at the max"""
+    try:
+        budget = float(value) if value else settings.REQUEST_DEADLINE_DEFAULT
+    except ValueError:
+        print(f"⚠️ Ignoring invalid {settings.REQUEST_DEADLINE_HEADER} header: {value!r}")
+        budget = settings.REQUEST_DEADLINE_DEFAULT
+    return max(0.0, min(budget, settings.REQUEST_DEADLINE_MAX))
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float]) -> Iterator[None]:
+    """Bound everything run in this context (and tasks spawned from it) to `budget` seconds"""
+    token = _deadline.set(None if budget is None else time.monotonic() + budget)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, None when there is no deadline"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    """Trim an upstream timeout to the remaining budget"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await under the remaining budget, cancelling the work when it runs out"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = None) -> T:
+    """Run work while polling the client; cancel it (and its upstream calls) if the client goes away"""
+    poll_interval = settings.DISCONNECT_POLL_INTERVAL if poll_interval is None else poll_interval
+    work = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=poll_interval)
+            if done:
+                return work.result()
+            if await request.is_disconnected():
+                print(f"🔌 Client disconnected, cancelling {request.method} {request.url.path}")
+                work.cancel()
+                raise asyncio.CancelledError()
+    finally:
+        if not work.done():
+            work.cancel()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import time
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from ..core.config import settings
+from ..utils.cache import redis_client, REDIS_AVAILABLE
+
+
+class ExperimentCache:
+    """Whole-experiment result cache keyed on the canonical (companies, categories) signature.
+
+    A repeat submission is answered with a single lookup. Each entry is indexed
+    under every (category, brand) it covers; when a category entry is refreshed
+    upstream, every cached experiment sharing at least one brand pair with the
+    refreshed group in that category is dropped - that covers exact entries,
+    tournament groups and preference-derived subsets alike.
+
+    Without Redis, entries live in a size-capped LRU; expired entries are
+    swept on write, at most once per sweep_interval.
+    """
+
+    sweep_interval = 60.0
+
+    def __init__(self, use_redis: bool = REDIS_AVAILABLE, ttl: int = None, max_entries: int = None):
+        self.use_redis = use_redis
+        self.ttl = ttl or settings.EXPERIMENT_CACHE_TTL
+        self.max_entries = settings.EXPERIMENT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any, List[str]]]" = OrderedDict()
+        self._index: Dict[str, set] = {}
+        self._next_sweep = 0.0
+        self.lock = threading.Lock()
+        # Reporting
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip().lower()
+
+    def _key(self, companies: List[str], categories: List[str], samples: Optional[int]) -> str:
+        signature = json.dumps([sorted(companies), sorted(categories), samples or 1])
+        return f"experiment:{hashlib.md5(signature.encode()).hexdigest()}"
+
+    def _index_key(self, category: str, brand: str) -> str:
+        return f"expdeps:{self._normalize(category)}:{self._normalize(brand)}"
+
+    def get(self, companies: List[str], categories: List[str], samples: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached {"results", "average_ranks"} payload, if any"""
+        key = self._key(companies, categories, samples)
+        payload = None
+        try:
+            if self.use_redis:
+                cached = redis_client.get(key)
+                payload = json.loads(cached) if cached else None
+            else:
+                with self.lock:
+                    entry = self._entries.get(key)
+                    if entry and entry[0] >= time.time():
+                        payload = entry[1]
+                        self._entries.move_to_end(key)
+                    elif entry:
+                        self._drop(key)
+        except Exception as e:
+            print(f"Experiment cache retrieval error: {e}")
+
+        with self.lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def set(self, companies: List[str], categories: List[str], samples: Optional[int], payload: Dict[str, Any]) -> None:
+        """Store a final experiment payload and register its category dependencies"""
+        key = self._key(companies, categories, samples)
+        index_keys = [self._index_key(category, brand) for category in categories for brand in companies]
+        try:
+            if self.use_redis:
+                pipe = redis_client.pipeline()
+                pipe.setex(key, self.ttl, json.dumps(payload))
+                for index_key in index_keys:
+                    pipe.sadd(index_key, key)
+                    pipe.expire(index_key, self.ttl)
+                pipe.execute()
+            else:
+                with self.lock:
+                    now = time.time()
+                    self._drop(key)
+                    self._entries[key] = (now + self.ttl, payload, index_keys)
+                    for index_key in index_keys:
+                        self._index.setdefault(index_key, set()).add(key)
+                    if now >= self._next_sweep:
+                        self._sweep(now)
+                    while len(self._entries) > self.max_entries:
+                        self._drop(next(iter(self._entries)))
+                        self.evictions += 1
+        except Exception as e:
+            print(f"Experiment cache setting error: {e}")
+
+    def _drop(self, key: str) -> None:
+        """Remove an in-memory entry and its index references (lock held)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for index_key in entry[2]:
+            keys = self._index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[index_key]
+
+    def _sweep(self, now: float) -> None:
+        for key in [key for key, entry in self._entries.items() if entry[0] < now]:
+            self._drop(key)
+        self._next_sweep = now + self.sweep_interval
+
+    def invalidate(self, brands: List[str], category: str) -> int:
+        """Drop cached experiments that depend on a refreshed (brands, category) entry"""
+        index_keys = [self._index_key(category, brand) for brand in set(brands)]
+        try:
+            if self.use_redis:
+                pipe = redis_client.pipeline()
+                for index_key in index_keys:
+                    pipe.smembers(index_key)
+                members = pipe.execute()
+                # An experiment listed under two of the group's brands shares a pair with it
+                shared = Counter(key for keys in members for key in keys)
+                stale = [key for key, count in shared.items() if count >= 2]
+                if stale:
+                    pipe = redis_client.pipeline()
+                    pipe.delete(*stale)
+                    for index_key in index_keys:
+                        pipe.srem(index_key, *stale)
+                    pipe.execute()
+            else:
+                with self.lock:
+                    shared = Counter(key for index_key in index_keys for key in self._index.get(index_key, ()))
+                    stale = [key for key, count in shared.items() if count >= 2]
+                    for key in stale:
+                        self._drop(key)
+        except Exception as e:
+            print(f"Experiment cache invalidation error: {e}")
+            return 0
+
+        if stale:
+            with self.lock:
+                self.invalidations += len(stale)
+            print(f"🧹 Invalidated {len(stale)} cached experiments after refreshing {category}")
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get experiment cache statistics"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis" if self.use_redis else "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries) if not self.use_redis else None,
+            }
+
+
+# Global instance
+experiment_cache = ExperimentCache()
@@ -0,0 +1,112 @@
+import asyncio
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+ANONYMOUS = "anonymous"
+
+# Who the upstream work in this context is done for: "user:<id>" or "ip:<address>"
+_client: ContextVar[str] = ContextVar("fair_queue_client", default=ANONYMOUS)
+
+
+def current_client() -> str:
+    return _client.get()
+
+
+@contextmanager
+def client_scope(client: str) -> Iterator[None]:
+    """Attribute upstream calls made in the block (and tasks created inside it) to a client"""
+    token = _client.set(client)
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+
+def user_client(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class UserQueueFull(Exception):
+    """A client already has the maximum number of queued upstream calls"""
+
+
+class DRRQueue:
+    """Deficit round-robin over per-client FIFO queues.
+
+    Each client with waiters gets `quantum` credit per turn and is served
+    while its credit covers the cost of its next call, so a client with many
+    queued calls cannot push ahead of a client with one.
+    """
+
+    def __init__(self, quantum: float = 1.0):
+        self.quantum = quantum
+        self._queues: Dict[str, deque] = {}
+        self._active: deque = deque()
+        self._deficit: Dict[str, float] = defaultdict(float)
+        self._turn: Optional[str] = None
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def depth(self, client: str) -> int:
+        return len(self._queues.get(client, ()))
+
+    def depths(self) -> Dict[str, int]:
+        return {client: len(queue) for client, queue in self._queues.items()}
+
+    def push(self, client: str, waiter: asyncio.Future, cost: float = 1.0) -> None:
+        if client not in self._queues:
+            self._queues[client] = deque()
+            self._active.append(client)
+        self._queues[client].append((waiter, cost))
+
+    def _drop_client(self, client: str) -> None:
+        del self._queues[client]
+        self._active.remove(client)
+        # Idle clients do not bank credit
+        self._deficit.pop(client, None)
+        if self._turn == client:
+            self._turn = None
+
+    def remove(self, client: str, waiter: asyncio.Future) -> bool:
+        queue = self._queues.get(client)
+        if not queue:
+            return False
+        for entry in queue:
+            if entry[0] is waiter:
+                queue.remove(entry)
+                if not queue:
+                    self._drop_client(client)
+                return True
+        return False
+
+    def pop(self, eligible: Callable[[str], bool]) -> Optional[Tuple[str, Any]]:
+        """Next (client, waiter) in DRR order among clients allowed to start now"""
+        while self._active:
+            served_any = False
+            for _ in range(len(self._active)):
+                client = self._active[0]
+                if not eligible(client):
+                    self._active.rotate(-1)
+                    self._turn = None
+                    continue
+                served_any = True
+                if self._turn != client:
+                    self._turn = client
+                    self._deficit[client] += self.quantum
+                queue = self._queues[client]
+                waiter, cost = queue[0]
+                if cost <= self._deficit[client]:
+                    queue.popleft()
+                    self._deficit[client] -= cost
+                    if not queue:
+                        self._drop_client(client)
+                    return client, waiter
+                # Turn over - carry the remaining credit into the next round
+                self._active.rotate(-1)
+                self._turn = None
+            if not served_any:
+                return None
+        return None
@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from fastapi import HTTPException
+from ..core.config import settings
+from ..utils.cache import redis_client, REDIS_AVAILABLE
+
+PENDING = "pending"
+COMPLETED = "completed"
+
+
+class IdempotencyStore:
+    """Deduplicates retried requests that carry the same Idempotency-Key.
+
+    The first request claims the key (Redis SET NX, or an in-memory dict) and
+    runs; its JSON response is stored for IDEMPOTENCY_KEY_TTL seconds. A retry
+    in the same process awaits the original's future; one in another process
+    polls the stored record until the original completes. If the original
+    fails the claim is released and a waiting retry runs the request itself.
+
+    In-memory records are swept once expired and capped at max_keys, oldest
+    completed records going first.
+    """
+
+    poll_interval = 0.1
+    sweep_interval = 60.0
+
+    def __init__(self, use_redis: bool = REDIS_AVAILABLE, ttl: int = None, wait_timeout: float = None,
+                 max_keys: int = None):
+        self.use_redis = use_redis
+        self.ttl = ttl or settings.IDEMPOTENCY_KEY_TTL
+        self.wait_timeout = settings.IDEMPOTENCY_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+        self.max_keys = settings.IDEMPOTENCY_MAX_KEYS if max_keys is None else max_keys
+        self._records: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._next_sweep = 0.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        # Reporting
+        self.executed = 0
+        self.replayed = 0
+        self.awaited = 0
+
+    @staticmethod
+    def _key(scope: str) -> str:
+        return f"idempotency:{scope}"
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.use_redis:
+            cached = redis_client.get(key)
+            return json.loads(cached) if cached else None
+        with self.lock:
+            entry = self._records.get(key)
+            if entry and entry[0] < time.time():
+                del self._records[key]
+                return None
+            return entry[1] if entry else None
+
+    def _claim(self, key: str, fingerprint: str) -> bool:
+        record = {"status": PENDING, "fingerprint": fingerprint}
+        # A pending claim outlives the longest wait so a crashed worker cannot block the key forever
+        pending_ttl = max(1, int(self.wait_timeout) * 2)
+        if self.use_redis:
+            return bool(redis_client.set(key, json.dumps(record), nx=True, ex=pending_ttl))
+        with self.lock:
+            entry = self._records.get(key)
+            if entry and entry[0] >= time.time():
+                return False
+            self._store(key, time.time() + pending_ttl, record)
+            return True
+
+    def _complete(self, key: str, fingerprint: str, response: Dict[str, Any]) -> None:
+        record = {"status": COMPLETED, "fingerprint": fingerprint, "response": response}
+        if self.use_redis:
+            redis_client.setex(key, self.ttl, json.dumps(record))
+        else:
+            with self.lock:
+                self._store(key, time.time() + self.ttl, record)
+
+    def _store(self, key: str, expires_at: float, record: Dict[str, Any]) -> None:
+        """Write an in-memory record, then sweep and trim the dict (lock held)"""
+        self._records[key] = (expires_at, record)
+        self._records.move_to_end(key)
+        now = time.time()
+        if now >= self._next_sweep:
+            for stale in [stale for stale, entry in self._records.items() if entry[0] < now]:
+                del self._records[stale]
+            self._next_sweep = now + self.sweep_interval
+        if len(self._records) > self.max_keys:
+            # Pending claims guard requests still running, so completed records go first
+            completed = (other for other, entry in self._records.items() if entry[1]["status"] == COMPLETED)
+            for other in list(itertools.islice(completed, len(self._records) - self.max_keys)):
+                del self._records[other]
+
+    def _release(self, key: str) -> None:
+        if self.use_redis:
+            redis_client.delete(key)
+        else:
+            with self.lock:
+                self._records.pop(key, None)
+
+    @staticmethod
+    def _check_fingerprint(record: Dict[str, Any], fingerprint: str) -> None:
+        if record.get("fingerprint") != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+
+    async def _wait_for_completion(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Poll a claim held by another worker; None means it was released and can be re-claimed"""
+        deadline = time.time() + self.wait_timeout
+        while time.time() < deadline:
+            record = self._load(key)
+            if record is None:
+                return None
+            self._check_fingerprint(record, fingerprint)
+            if record["status"] == COMPLETED:
+                return record["response"]
+            await asyncio.sleep(self.poll_interval)
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    async def run(self, scope: str, fingerprint: str,
+                  handler: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """Run handler once per scope key; returns (response, replayed)"""
+        key = self._key(scope)
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                try:
+                    response, inflight_fingerprint = await asyncio.shield(inflight)
+                except BaseException:
+                    if not inflight.done():
+                        raise  # this retry itself was cancelled
+                    # The original failed and released its claim - run this request instead
+                    continue
+                with self.lock:
+                    self.awaited += 1
+                self._check_fingerprint({"fingerprint": inflight_fingerprint}, fingerprint)
+                return response, True
+
+            record = self._load(key)
+            if record is not None:
+                self._check_fingerprint(record, fingerprint)
+                if record["status"] == COMPLETED:
+                    with self.lock:
+                        self.replayed += 1
+                    return record["response"], True
+                response = await self._wait_for_completion(key, fingerprint)
+                if response is not None:
+                    with self.lock:
+                        self.awaited += 1
+                    return response, True
+                continue
+
+            if self._claim(key, fingerprint):
+                break
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await handler()
+        except BaseException as e:
+            self._release(key)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception retrieved - there may be no retry waiting on it
+                future.exception()
+            raise
+        else:
+            self._complete(key, fingerprint, response)
+            future.set_result((response, fingerprint))
+            with self.lock:
+                self.executed += 1
+            return response, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get idempotency statistics"""
+        with self.lock:
+            return {
+                "backend": "redis" if self.use_redis else "memory",
+                "executed": self.executed,
+                "replayed": self.replayed,
+                "awaited_in_flight": self.awaited,
+                "in_flight": len(self._inflight),
+                "records": len(self._records) if not self.use_redis else None,
+            }
+
+
+# Global instance
+idempotency_store = IdempotencyStore()
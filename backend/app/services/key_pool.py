@@ -0,0 +1,125 @@
+import asyncio
+import time
+import threading
+from typing import List, Dict, Any, Optional
+from ..core.config import settings
+from .concurrency import current_traffic, RANKING
+
+
+class KeyPoolExhausted(Exception):
+    """Every key in the pool is ejected"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("All upstream API keys are ejected")
+        self.retry_after = retry_after
+
+
+class PooledKey:
+    """One upstream API key with its own token bucket and ejection state"""
+
+    def __init__(self, key: str, rate_per_minute: float, burst: int):
+        self.key = key
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.in_flight = 0
+        self.ejected_until = 0.0
+        # Reporting
+        self.requests = 0
+        self.ejections = 0
+
+    @property
+    def label(self) -> str:
+        return f"...{self.key[-4:]}" if len(self.key) > 4 else "..."
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class APIKeyPool:
+    """Spreads upstream calls over several API keys.
+
+    Each key refills at `rate_per_minute`; a call takes the least-loaded key
+    that has a token, waiting for the earliest refill when none does. A key
+    is ejected for a while on 429 (honouring Retry-After) and for longer on
+    401/403, so aggregate throughput scales with the number of healthy keys.
+
+    Calls outside the ranking traffic class must leave `ranking_reserve`
+    tokens in a key's bucket, so a validation spike cannot drain the budget
+    ranking needs.
+    """
+
+    def __init__(self, keys: List[str], rate_per_minute: float = None, burst: int = None,
+                 eject_seconds: float = None, auth_eject_seconds: float = None, ranking_reserve: int = None):
+        rate_per_minute = settings.PERPLEXITY_KEY_RPM if rate_per_minute is None else rate_per_minute
+        burst = max(1, settings.PERPLEXITY_KEY_BURST if burst is None else burst)
+        ranking_reserve = settings.API_KEY_RANKING_RESERVED_TOKENS if ranking_reserve is None else ranking_reserve
+        # Other classes can always get at least one token per key
+        self.ranking_reserve = max(0, min(ranking_reserve, burst - 1))
+        self.keys = [PooledKey(key, rate_per_minute, burst) for key in dict.fromkeys(keys) if key]
+        self.eject_seconds = settings.API_KEY_EJECT_SECONDS if eject_seconds is None else eject_seconds
+        self.auth_eject_seconds = settings.API_KEY_AUTH_EJECT_SECONDS if auth_eject_seconds is None else auth_eject_seconds
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _try_take(self, reserve: float) -> Any:
+        """A key, or the seconds to wait before one may be available"""
+        needed = 1 + reserve
+        now = time.monotonic()
+        with self.lock:
+            available = [key for key in self.keys if key.ejected_until <= now]
+            if not available:
+                raise KeyPoolExhausted(retry_after=min(key.ejected_until for key in self.keys) - now)
+            for key in available:
+                key.refill(now)
+            ready = [key for key in available if key.tokens >= needed]
+            if not ready:
+                return min((needed - key.tokens) / key.rate for key in available)
+            chosen = min(ready, key=lambda key: (key.in_flight, -key.tokens))
+            chosen.tokens -= 1
+            chosen.in_flight += 1
+            chosen.requests += 1
+            return chosen
+
+    async def acquire(self) -> PooledKey:
+        """Take a token from the least-loaded healthy key"""
+        reserve = 0 if current_traffic() == RANKING else self.ranking_reserve
+        while True:
+            taken = self._try_take(reserve)
+            if isinstance(taken, PooledKey):
+                return taken
+            await asyncio.sleep(taken)
+
+    def release(self, key: PooledKey, status_code: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        """Return a key after its call, ejecting it on throttling or auth failures"""
+        with self.lock:
+            key.in_flight -= 1
+            if status_code == 429:
+                eject_for = retry_after if retry_after is not None else self.eject_seconds
+            elif status_code in (401, 403):
+                eject_for = self.auth_eject_seconds
+            else:
+                return
+            key.ejected_until = time.monotonic() + eject_for
+            key.ejections += 1
+        print(f"🔑 Ejected API key {key.label} for {eject_for:.0f}s after status {status_code}")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-key load and health"""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "key": key.label,
+                    "healthy": key.ejected_until <= now,
+                    "in_flight": key.in_flight,
+                    "tokens": round(min(key.capacity, key.tokens + (now - key.updated_at) * key.rate), 2),
+                    "requests": key.requests,
+                    "ejections": key.ejections,
+                }
+                for key in self.keys
+            ]
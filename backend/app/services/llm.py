@@ -1,57 +1,50 @@
-import os
 import json
-from typing import List, Dict
-import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import List, Dict, Optional
 from app.utils.cache import cache_response, get_cached_response
+from app.core.config import settings
+from app.services.llm_router import llm_router, LLMRouter
+from app.services.prompts import ranking_messages, ranking_max_tokens
+from app.services.deadline import DeadlineExceeded
 
 class PerplexityService:
-    def __init__(self):
-        self.api_key = os.getenv("PERPLEXITY_API_KEY")
-        self.base_url = "https://api.perplexity.ai/chat/completions"
-        self.model = "sonar-pro"  # Working model!
+    def __init__(self, router: LLMRouter = None):
+        self.router = router or llm_router
 
-    def get_rankings(self, brands: List[str], category: str) -> Dict:
-        """Fetches rankings with caching."""
+    def _cache_key(self, brands: List[str], category: str, sample: Optional[int] = None) -> str:
         cache_key = f"rankings:{':'.join(sorted(brands))}:{category}"
-        
-        # Check cache first
-        cached = get_cached_response(cache_key)
+        # Self-consistency samples are cached individually so repeat runs are free
+        return cache_key if sample is None else f"{cache_key}:sample{sample}"
+
+    def get_cached_rankings(self, brands: List[str], category: str, sample: Optional[int] = None) -> Optional[Dict]:
+        """Returns cached rankings without calling the API."""
+        cached = get_cached_response(self._cache_key(brands, category, sample))
         if cached:
             print(f"📋 Cache hit for {category}")
-            return cached
+        return cached
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        prompt = f"""
-        Rank these brands for {category}: {', '.join(brands)}.
-        Return ONLY a JSON object with:
-        - 'rankings': {{"Brand1": 1, "Brand2": 2}} (1=best)
-        - 'reason': "Brief explanation"
-        Example: {{"rankings": {{"Nike": 1}}, "reason": "Superior comfort"}}
-        """
+    async def get_rankings(self, brands: List[str], category: str, sample: Optional[int] = None) -> Dict:
+        """Fetches rankings with caching. Passing a sample index draws an independent sample."""
+        cache_key = self._cache_key(brands, category, sample)
         
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.0  # Fully deterministic
-        }
+        # Check cache first
+        cached = self.get_cached_rankings(brands, category, sample)
+        if cached:
+            return cached
 
         try:
-            print(f"🚀 Calling Perplexity API with model: {self.model}")
-            print(f"📝 Payload: {json.dumps(payload, indent=2)}")
-            
-            response = requests.post(self.base_url, json=payload, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            print(f"✅ Raw API response: {json.dumps(result, indent=2)}")
+            result = await self.router.complete(
+                ranking_messages(brands, category),
+                max_tokens=ranking_max_tokens(brands),
+                # Fully deterministic, unless sampling for self-consistency
+                temperature=0.0 if sample is None else settings.CONSENSUS_TEMPERATURE,
+                timeout=30.0,
+                task={"type": "ranking", "brands": brands, "category": category},
+            )
+            print(f"✅ Rankings from {result['provider']} ({result['model']}) in {result['latency']:.2f}s")
             
             # Safer JSON parsing
             try:
-                content = json.loads(result["choices"][0]["message"]["content"])
+                content = json.loads(result["content"])
                 if not isinstance(content, dict):
                     raise ValueError("Response is not a dictionary")
                 
@@ -63,9 +56,8 @@ class PerplexityService:
                 print(f"❌ JSON parsing error: {str(e)}")
                 raise ValueError(f"Malformed API response: {str(e)}")
 
-        except requests.exceptions.RequestException as e:
-            print(f"❌ API call failed: {str(e)}")
-            raise ValueError(f"Perplexity API error: {str(e)}")
+        except (ValueError, DeadlineExceeded):
+            raise
         except Exception as e:
-            print(f"❌ Unexpected error: {str(e)}")
-            raise ValueError(f"Unexpected error: {str(e)}") 
\ No newline at end of file
+            print(f"❌ API call failed: {str(e)}")
+            raise ValueError(f"LLM API error: {str(e)}")
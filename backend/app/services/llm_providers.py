@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Union
+import httpx
+from ..core.config import settings
+from .concurrency import ConcurrencyLimiter, current_traffic, RANKING
+from .key_pool import APIKeyPool, KeyPoolExhausted
+
+
+class LLMProviderError(Exception):
+    """Upstream call failed; carries the HTTP status and Retry-After hint when known"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMProvider(ABC):
+    """Base class for chat-completion providers.
+
+    `task` is an optional structured description of the request (e.g.
+    {"type": "ranking", "brands": [...], "category": "..."}). Real providers
+    ignore it; the stub provider uses it to synthesize a parseable answer.
+
+    Calls outside the ranking traffic class pass a second gate first, which
+    keeps LLM_RANKING_RESERVED_SLOTS of the provider's slots for ranking.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, max_concurrency: int):
+        self.model = model
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        # Other classes can always get at least one slot
+        self.ranking_reserved_slots = max(0, min(settings.LLM_RANKING_RESERVED_SLOTS, self.limiter.max_concurrency - 1))
+        self.shared_gate = ConcurrencyLimiter(self.limiter.max_concurrency - self.ranking_reserved_slots)
+
+    @abstractmethod
+    async def _complete(self, messages: List[Dict[str, str]], max_tokens: Optional[int],
+                        temperature: float, timeout: float, task: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Send one completion upstream; returns {"content", and optionally "model", "usage"}"""
+
+    async def aclose(self) -> None:
+        """Release any pooled connections held by the provider"""
+
+    def extra_stats(self) -> Dict[str, Any]:
+        """Provider-specific stats merged into the router's report"""
+        return {}
+
+    @asynccontextmanager
+    async def _traffic_gate(self):
+        if current_traffic() == RANKING:
+            yield
+            return
+        async with self.shared_gate.slot():
+            yield
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                       temperature: float = 0.0, timeout: float = 30.0,
+                       task: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run one chat completion under this provider's concurrency cap.
+
+        Returns {"content", "model", "provider", "usage"}.
+        """
+        async with self._traffic_gate(), self.limiter.slot():
+            result = await self._complete(messages, max_tokens, temperature, timeout, task)
+        result.setdefault("model", self.model)
+        result.setdefault("usage", {})
+        result["provider"] = self.name
+        return result
+
+
+class PerplexityProvider(LLMProvider):
+    name = "perplexity"
+    base_url = "https://api.perplexity.ai/chat/completions"
+
+    def __init__(self, api_keys: Union[str, List[str]], model: str = None, max_concurrency: int = None):
+        self.keys = APIKeyPool([api_keys] if isinstance(api_keys, str) else api_keys)
+        # Each key brings its own upstream capacity
+        per_key = max_concurrency or settings.PERPLEXITY_MAX_CONCURRENCY
+        super().__init__(model or settings.PERPLEXITY_MODEL, per_key * max(1, len(self.keys)))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One client for the provider's lifetime keeps connections and TLS sessions warm
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=httpx.Limits(max_connections=self.limiter.max_concurrency))
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def extra_stats(self) -> Dict[str, Any]:
+        return {"keys": self.keys.get_stats()}
+
+    async def _complete(self, messages, max_tokens, temperature, timeout, task):
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+
+        try:
+            key = await self.keys.acquire()
+        except KeyPoolExhausted as e:
+            raise LLMProviderError(str(e), status_code=503, retry_after=e.retry_after) from e
+
+        status_code = retry_after = None
+        try:
+            try:
+                response = await self.client.post(
+                    self.base_url,
+                    headers={
+                        "Authorization": f"Bearer {key.key}",
+                        "Content-Type": "application/json"
+                    },
+                    json=payload,
+                    timeout=timeout
+                )
+            except httpx.HTTPError as e:
+                raise LLMProviderError(f"Perplexity request failed: {e}") from e
+            status_code = response.status_code
+            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        finally:
+            self.keys.release(key, status_code, retry_after)
+
+        if response.status_code != 200:
+            raise LLMProviderError(
+                f"Perplexity API returned status {response.status_code}: {response.text}",
+                status_code=response.status_code,
+                retry_after=retry_after,
+            )
+
+        result = response.json()
+        return {
+            "content": result["choices"][0]["message"]["content"],
+            "model": result.get("model", self.model),
+            "usage": result.get("usage", {}),
+        }
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = None, max_concurrency: int = None):
+        super().__init__(model or settings.OPENAI_MODEL, max_concurrency or settings.OPENAI_MAX_CONCURRENCY)
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _complete(self, messages, max_tokens, temperature, timeout, task):
+        import openai
+
+        try:
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout,
+            )
+        except openai.APIStatusError as e:
+            raise LLMProviderError(
+                f"OpenAI API returned status {e.status_code}: {e.message}",
+                status_code=e.status_code,
+                retry_after=_parse_retry_after(e.response.headers.get("Retry-After")),
+            ) from e
+        except openai.OpenAIError as e:
+            raise LLMProviderError(f"OpenAI request failed: {e}") from e
+
+        usage = completion.usage
+        return {
+            "content": completion.choices[0].message.content,
+            "model": completion.model,
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+            } if usage else {},
+        }
+
+
+class StubProvider(LLMProvider):
+    """Deterministic local provider for offline tests and benchmarks.
+
+    Rankings follow a stable hash of (category, brand), so overlapping
+    brand sets are always mutually consistent.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = None, max_concurrency: int = None):
+        super().__init__("stub", max_concurrency or settings.STUB_LLM_MAX_CONCURRENCY)
+        self.latency = settings.STUB_LLM_LATENCY_MS / 1000 if latency is None else latency
+
+    @staticmethod
+    def _score(category: str, brand: str) -> str:
+        return hashlib.md5(f"{category.lower()}:{brand.lower()}".encode()).hexdigest()
+
+    @staticmethod
+    def _looks_real(item: str) -> bool:
+        letters = [c for c in item.lower() if c.isalnum()]
+        return len(letters) >= 2 and len(set(letters)) > 1
+
+    def _answer(self, task: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        task = task or {}
+        task_type = task.get("type")
+        if task_type == "ranking":
+            ordered = sorted(task["brands"], key=lambda brand: self._score(task["category"], brand))
+            return {
+                "rankings": {brand: i + 1 for i, brand in enumerate(ordered)},
+                "reason": f"Stub ranking for {task['category']}",
+            }
+        if task_type in ("validate_companies", "validate_categories"):
+            kind = task_type.split("_", 1)[1]
+            items = task["items"]
+            return {
+                f"valid_{kind}": [item for item in items if self._looks_real(item)],
+                f"invalid_{kind}": [item for item in items if not self._looks_real(item)],
+                "reason": "Stub validation",
+            }
+        return {"message": "stub response"}
+
+    async def _complete(self, messages, max_tokens, temperature, timeout, task):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        content = json.dumps(self._answer(task))
+        prompt_chars = sum(len(message.get("content", "")) for message in messages)
+        return {
+            "content": content,
+            "usage": {"prompt_tokens": max(1, prompt_chars // 4), "completion_tokens": max(1, len(content) // 4)},
+        }
+
+
+def build_providers() -> List[LLMProvider]:
+    """Instantiate the providers listed in LLM_PROVIDERS that have credentials configured"""
+    providers = []
+    perplexity_keys = [key.strip() for key in (settings.PERPLEXITY_API_KEYS or "").split(",") if key.strip()]
+    if settings.PERPLEXITY_API_KEY and settings.PERPLEXITY_API_KEY not in perplexity_keys:
+        perplexity_keys.insert(0, settings.PERPLEXITY_API_KEY)
+    for name in [name.strip().lower() for name in settings.LLM_PROVIDERS.split(",") if name.strip()]:
+        if name == "perplexity" and perplexity_keys:
+            providers.append(PerplexityProvider(perplexity_keys))
+        elif name == "openai" and settings.OPENAI_API_KEY:
+            providers.append(OpenAIProvider(settings.OPENAI_API_KEY))
+        elif name == "stub":
+            providers.append(StubProvider())
+    return providers
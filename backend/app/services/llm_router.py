@@ -0,0 +1,182 @@
+import asyncio
+import time
+import threading
+from typing import List, Dict, Any, Optional
+from ..core.config import settings
+from .llm_providers import LLMProvider, LLMProviderError, build_providers
+from .performance_monitor import performance_monitor
+from .prompts import estimate_message_tokens, estimate_tokens
+from .deadline import DeadlineExceeded, clamp_timeout, within_deadline, remaining
+from .retry import RetryPolicy, RetryBudget
+
+
+class ProviderHealth:
+    """Latency and error EWMAs for one provider"""
+
+    def __init__(self):
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.last_attempt = 0.0
+
+
+class LLMRouter:
+    """Sends each call to the fastest healthy provider, failing over on errors.
+
+    A provider is unhealthy while its error EWMA is above the threshold; it is
+    probed again once LLM_ROUTER_PROBE_INTERVAL seconds pass without a call.
+    Providers never tried yet sort first so every provider gets measured.
+
+    When every candidate fails with a transient error, the whole round is
+    retried after a jittered backoff, as long as the retry budget and the
+    request deadline allow it.
+    """
+
+    def __init__(self, providers: List[LLMProvider], alpha: float = None,
+                 max_error_rate: float = None, probe_interval: float = None,
+                 retry_policy: RetryPolicy = None, retry_budget: RetryBudget = None):
+        self.providers = providers
+        self.alpha = settings.LLM_ROUTER_EWMA_ALPHA if alpha is None else alpha
+        self.max_error_rate = settings.LLM_ROUTER_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        self.probe_interval = settings.LLM_ROUTER_PROBE_INTERVAL if probe_interval is None else probe_interval
+        self.health = {provider.name: ProviderHealth() for provider in providers}
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_budget = retry_budget or RetryBudget()
+        self.lock = threading.Lock()
+
+    def _is_healthy(self, provider: LLMProvider, now: float) -> bool:
+        health = self.health[provider.name]
+        return health.error_ewma < self.max_error_rate or now - health.last_attempt > self.probe_interval
+
+    def candidates(self) -> List[LLMProvider]:
+        """Providers in the order they should be tried"""
+        now = time.time()
+        with self.lock:
+            def sort_key(provider: LLMProvider):
+                health = self.health[provider.name]
+                saturated = provider.limiter.get_stats()["in_flight"] >= provider.limiter.max_concurrency
+                return (
+                    not self._is_healthy(provider, now),
+                    saturated,
+                    health.latency_ewma or 0.0,
+                    health.error_ewma,
+                )
+            return sorted(self.providers, key=sort_key)
+
+    def _record(self, provider: LLMProvider, latency: Optional[float], failed: bool) -> None:
+        with self.lock:
+            health = self.health[provider.name]
+            health.calls += 1
+            health.last_attempt = time.time()
+            health.error_ewma = (1 - self.alpha) * health.error_ewma + self.alpha * (1.0 if failed else 0.0)
+            if failed:
+                health.errors += 1
+            elif latency is not None:
+                health.latency_ewma = latency if health.latency_ewma is None else \
+                    (1 - self.alpha) * health.latency_ewma + self.alpha * latency
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """Run a chat completion on the best available provider"""
+        if not self.providers:
+            raise LLMProviderError("No LLM provider is configured")
+
+        last_error = None
+        default_timeout = kwargs.pop("timeout", 30.0)
+        self.retry_budget.record_request()
+        for attempt in range(self.retry_policy.max_attempts):
+            if attempt and not await self._backoff(attempt, last_error):
+                break
+            for provider in self.candidates():
+                start_time = time.time()
+                try:
+                    # Each attempt only gets what is left of the request's budget
+                    result = await within_deadline(
+                        provider.complete(messages, timeout=clamp_timeout(default_timeout), **kwargs)
+                    )
+                except DeadlineExceeded:
+                    # Out of budget is not the provider's fault - don't penalise it or fail over
+                    raise
+                except Exception as e:
+                    self._record(provider, None, failed=True)
+                    print(f"❌ LLM provider {provider.name} failed: {e}")
+                    last_error = e
+                    continue
+                latency = time.time() - start_time
+                self._record(provider, latency, failed=False)
+                result["latency"] = latency
+                self._account_tokens(provider, messages, result, kwargs)
+                return result
+
+        raise last_error
+
+    async def _backoff(self, retry: int, error: Exception) -> bool:
+        """Sleep before a retry round; False when the error, deadline or budget rules it out"""
+        if not self.retry_policy.is_retryable(error):
+            return False
+        delay = self.retry_policy.backoff(retry, getattr(error, "retry_after", None))
+        if delay is None:
+            print(f"⚠️ Upstream asked to wait {error.retry_after}s, longer than the retry cap - not retrying")
+            return False
+        left = remaining()
+        if left is not None and delay >= left:
+            return False
+        if not self.retry_budget.try_acquire():
+            print("⚠️ LLM retry budget exhausted, not retrying")
+            return False
+        print(f"🔁 Retrying LLM call in {delay:.2f}s (retry {retry} of {self.retry_policy.max_attempts - 1})")
+        await asyncio.sleep(delay)
+        return True
+
+    @staticmethod
+    def _account_tokens(provider: LLMProvider, messages: List[Dict[str, str]],
+                        result: Dict[str, Any], kwargs: Dict[str, Any]) -> None:
+        """Record prompt/completion tokens per call, estimating when usage is not reported"""
+        usage = result.get("usage") or {}
+        estimated = not usage.get("prompt_tokens") or not usage.get("completion_tokens")
+        prompt_tokens = usage.get("prompt_tokens") or estimate_message_tokens(messages)
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(result.get("content") or "")
+        result["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+        task = kwargs.get("task") or {}
+        performance_monitor.track_token_usage(
+            operation=task.get("type", "other"),
+            provider=provider.name,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            max_tokens=kwargs.get("max_tokens"),
+            latency=result["latency"],
+            estimated=estimated,
+        )
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        return {"max_attempts": self.retry_policy.max_attempts, "budget": self.retry_budget.get_stats()}
+
+    async def aclose(self) -> None:
+        """Close every provider's pooled connections"""
+        for provider in self.providers:
+            await provider.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-provider health, latency and concurrency"""
+        now = time.time()
+        with self.lock:
+            return {
+                provider.name: {
+                    "model": provider.model,
+                    "healthy": self._is_healthy(provider, now),
+                    "latency_ewma": self.health[provider.name].latency_ewma,
+                    "error_ewma": round(self.health[provider.name].error_ewma, 4),
+                    "calls": self.health[provider.name].calls,
+                    "errors": self.health[provider.name].errors,
+                    "concurrency": provider.limiter.get_stats(),
+                    "reserved_for_ranking": provider.ranking_reserved_slots,
+                    "non_ranking_in_flight": provider.shared_gate.get_stats()["in_flight"],
+                    **provider.extra_stats(),
+                }
+                for provider in self.providers
+            }
+
+
+# Global instance
+llm_router = LLMRouter(build_providers())
@@ -0,0 +1,91 @@
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+from passlib.context import CryptContext
+from ..core.config import settings
+from .admission import Overloaded
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool, off the request threadpool and event loop.
+
+    bcrypt releases the GIL, so threads hash in parallel. At most `max_workers`
+    hashes run at once and `max_queued` more may wait; beyond that callers are
+    shed with Overloaded instead of piling up behind a login storm.
+    """
+
+    def __init__(self, context: CryptContext = None, max_workers: int = None, max_queued: int = None):
+        self.context = context or pwd_context
+        self.max_workers = max(1, settings.PASSWORD_HASH_WORKERS if max_workers is None else max_workers)
+        self.max_queued = settings.PASSWORD_HASH_MAX_QUEUED if max_queued is None else max_queued
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._running = 0
+        self.lock = threading.Lock()
+        # Reporting
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._wait_total = 0.0
+        self._hash_total = 0.0
+
+    async def _run(self, fn, *args):
+        with self.lock:
+            if self._pending >= self.max_workers + self.max_queued:
+                self.rejected += 1
+                raise Overloaded("password_hashing", settings.ADMISSION_RETRY_AFTER)
+            self._pending += 1
+        submitted = time.monotonic()
+
+        def timed():
+            started = time.monotonic()
+            with self.lock:
+                self._running += 1
+                self._wait_total += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self.lock:
+                    self._running -= 1
+                    self._hash_total += time.monotonic() - started
+                    self.completed += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            with self.lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; a new hash is returned when the stored one uses outdated parameters"""
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash:
+            with self.lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool occupancy and timing"""
+        with self.lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._wait_total / self.completed * 1000, 2) if self.completed else 0,
+                "avg_hash_ms": round(self._hash_total / self.completed * 1000, 2) if self.completed else 0,
+            }
+
+
+# Global instance shared by registration and login
+password_hasher = PasswordHasher()
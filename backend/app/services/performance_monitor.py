@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional
 from collections import defaultdict, deque
 import psutil
 import os
+from ..core.config import settings
 
 
 class PerformanceMonitor:
@@ -19,6 +20,7 @@ class PerformanceMonitor:
         self.request_times = deque(maxlen=1000)  # Store last 1000 request times
         self.error_times = deque(maxlen=100)     # Store last 100 error times
         self.api_response_times = defaultdict(list)  # Track API response times
+        self.token_usage = defaultdict(self._empty_token_usage)  # Per-operation LLM token accounting
         self.lock = threading.Lock()
         
         # System metrics
@@ -99,6 +101,63 @@ class PerformanceMonitor:
             if len(self.api_response_times[api_name]) > 100:
                 self.api_response_times[api_name] = self.api_response_times[api_name][-100:]
     
+    @staticmethod
+    def _empty_token_usage() -> Dict[str, Any]:
+        return {
+            'calls': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'max_tokens_budget': 0,
+            'latency': 0.0,
+            'estimated_calls': 0,
+            'providers': defaultdict(int),
+        }
+    
+    def track_token_usage(self, operation: str, provider: str, prompt_tokens: int, completion_tokens: int,
+                          max_tokens: Optional[int] = None, latency: float = 0.0, estimated: bool = False):
+        """Track prompt/completion tokens for one LLM call"""
+        with self.lock:
+            usage = self.token_usage[operation]
+            usage['calls'] += 1
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['max_tokens_budget'] += max_tokens or 0
+            usage['latency'] += latency
+            usage['estimated_calls'] += 1 if estimated else 0
+            usage['providers'][provider] += 1
+    
+    def _token_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens / 1000 * settings.LLM_PROMPT_COST_PER_1K
+                + completion_tokens / 1000 * settings.LLM_COMPLETION_COST_PER_1K)
+    
+    def _token_stats(self) -> Dict[str, Any]:
+        """Per-operation token usage, throughput and estimated cost (caller holds the lock)"""
+        operations = {}
+        for operation, usage in self.token_usage.items():
+            calls = max(usage['calls'], 1)
+            operations[operation] = {
+                'calls': usage['calls'],
+                'prompt_tokens': usage['prompt_tokens'],
+                'completion_tokens': usage['completion_tokens'],
+                'avg_prompt_tokens': usage['prompt_tokens'] / calls,
+                'avg_completion_tokens': usage['completion_tokens'] / calls,
+                'budget_utilization': (usage['completion_tokens'] / usage['max_tokens_budget'] * 100
+                                       if usage['max_tokens_budget'] else None),
+                'completion_tokens_per_second': (usage['completion_tokens'] / usage['latency']
+                                                 if usage['latency'] else None),
+                'estimated_calls': usage['estimated_calls'],
+                'estimated_cost': round(self._token_cost(usage['prompt_tokens'], usage['completion_tokens']), 6),
+                'providers': dict(usage['providers']),
+            }
+        prompt_total = sum(usage['prompt_tokens'] for usage in self.token_usage.values())
+        completion_total = sum(usage['completion_tokens'] for usage in self.token_usage.values())
+        return {
+            'operations': operations,
+            'total_prompt_tokens': prompt_total,
+            'total_completion_tokens': completion_total,
+            'estimated_cost': round(self._token_cost(prompt_total, completion_total), 6),
+        }
+    
     def track_error(self, operation: str, error_message: str) -> None:
         """Track errors for monitoring"""
         with self.lock:
@@ -169,6 +228,7 @@ class PerformanceMonitor:
                 },
                 'fallback_usage': dict(self.fallback_usage),
                 'api_performance': api_performance,
+                'tokens': self._token_stats(),
                 'system': {
                     'cpu_percent': cpu_percent,
                     'memory_percent': memory.percent,
@@ -259,6 +319,7 @@ class PerformanceMonitor:
             self.request_times.clear()
             self.error_times.clear()
             self.api_response_times.clear()
+            self.token_usage.clear()
             self.start_time = time.time()
 
 
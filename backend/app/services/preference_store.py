@@ -0,0 +1,148 @@
+import time
+import threading
+from itertools import combinations
+from typing import List, Dict, Any, Optional
+from ..core.config import settings
+from ..utils.cache import redis_client, REDIS_AVAILABLE
+
+
+class PreferenceStore:
+    """Pairwise brand preferences per category, decomposed from ranking results.
+
+    Every ranking of n brands contributes n*(n-1)/2 "a beats b" observations.
+    A later request whose pairs are all covered - and never contradicted - can
+    be answered locally, e.g. {Nike, Adidas} after {Nike, Adidas, Puma}.
+    """
+
+    def __init__(self, use_redis: bool = REDIS_AVAILABLE, ttl: int = None):
+        self.use_redis = use_redis
+        self.ttl = ttl or settings.PREFERENCE_STORE_TTL
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        # Reporting
+        self.lookups = 0
+        self.derived = 0
+        self.uncovered = 0
+        self.conflicts = 0
+        self.recorded_rankings = 0
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip().lower()
+
+    def _category_key(self, category: str) -> str:
+        return f"prefs:{self._normalize(category)}"
+
+    def _increment(self, key: str, fields: List[str]) -> None:
+        if self.use_redis:
+            pipe = redis_client.pipeline()
+            for field in fields:
+                pipe.hincrby(key, field, 1)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+            return
+
+        with self.lock:
+            entry = self._memory.get(key)
+            if entry is None or entry["expires_at"] < time.time():
+                entry = {"counts": {}}
+                self._memory[key] = entry
+            entry["expires_at"] = time.time() + self.ttl
+            for field in fields:
+                entry["counts"][field] = entry["counts"].get(field, 0) + 1
+
+    def _fetch(self, key: str, fields: List[str]) -> List[int]:
+        if self.use_redis:
+            return [int(value) if value else 0 for value in redis_client.hmget(key, fields)]
+
+        with self.lock:
+            entry = self._memory.get(key)
+            if entry is None or entry["expires_at"] < time.time():
+                return [0] * len(fields)
+            return [entry["counts"].get(field, 0) for field in fields]
+
+    def record(self, category: str, rankings: Dict[str, Any]) -> None:
+        """Store every pairwise preference implied by a {brand: rank} result"""
+        ranked = [
+            (self._normalize(brand), rank) for brand, rank in rankings.items()
+            if isinstance(rank, (int, float))
+        ]
+        fields = []
+        for (brand_a, rank_a), (brand_b, rank_b) in combinations(ranked, 2):
+            if rank_a == rank_b or brand_a == brand_b:
+                continue
+            fields.append(f"{brand_a}>{brand_b}" if rank_a < rank_b else f"{brand_b}>{brand_a}")
+
+        if not fields:
+            return
+        try:
+            self._increment(self._category_key(category), fields)
+            with self.lock:
+                self.recorded_rankings += 1
+        except Exception as e:
+            print(f"Preference store write error: {e}")
+
+    def derive(self, brands: List[str], category: str) -> Optional[Dict[str, Any]]:
+        """Answer a ranking request from stored preferences, or None if not fully covered"""
+        names = [self._normalize(brand) for brand in brands]
+        if len(names) < 2 or len(set(names)) != len(names):
+            return None
+
+        pairs = list(combinations(names, 2))
+        fields = []
+        for brand_a, brand_b in pairs:
+            fields.extend([f"{brand_a}>{brand_b}", f"{brand_b}>{brand_a}"])
+
+        try:
+            counts = self._fetch(self._category_key(category), fields)
+        except Exception as e:
+            print(f"Preference store read error: {e}")
+            return None
+
+        with self.lock:
+            self.lookups += 1
+
+        wins = {name: 0 for name in names}
+        for index, (brand_a, brand_b) in enumerate(pairs):
+            a_wins, b_wins = counts[2 * index], counts[2 * index + 1]
+            if not a_wins and not b_wins:
+                with self.lock:
+                    self.uncovered += 1
+                return None
+            if a_wins and b_wins:
+                with self.lock:
+                    self.conflicts += 1
+                return None
+            wins[brand_a if a_wins else brand_b] += 1
+
+        # A consistent total order gives win counts n-1, n-2, ..., 0; anything else is a cycle
+        if sorted(wins.values()) != list(range(len(names))):
+            with self.lock:
+                self.conflicts += 1
+            return None
+
+        with self.lock:
+            self.derived += 1
+        return {
+            "rankings": {brand: len(names) - wins[name] for brand, name in zip(brands, names)},
+            "reason": f"Derived from {len(pairs)} cached pairwise preferences",
+            "metadata": {"source": "preference_store"},
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get derivation statistics"""
+        with self.lock:
+            return {
+                "backend": "redis" if self.use_redis else "memory",
+                "lookups": self.lookups,
+                "derived": self.derived,
+                "uncovered": self.uncovered,
+                "conflicts": self.conflicts,
+                "derivation_rate": round(self.derived / self.lookups * 100, 2) if self.lookups else 0,
+                "recorded_rankings": self.recorded_rankings,
+                "categories": len(self._memory) if not self.use_redis else None,
+            }
+
+
+# Global instance
+preference_store = PreferenceStore()
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BATCH, BACKGROUND)
+
+# Priority class of the work running in this context; request handlers default to interactive
+_lane: ContextVar[str] = ContextVar("priority_lane", default=INTERACTIVE)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+@contextmanager
+def lane_scope(lane: str) -> Iterator[None]:
+    """Run the block (and tasks created inside it) in the given priority lane"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def parse_lane_weights(value: str) -> Dict[str, int]:
+    """Parse "interactive:8,batch:3" into {"interactive": 8, "batch": 3}"""
+    weights = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        lane, _, weight = item.partition(":")
+        weights[lane.strip()] = max(1, int(weight or 1))
+    return weights
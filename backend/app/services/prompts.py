@@ -0,0 +1,75 @@
+from typing import List, Dict
+from ..core.config import settings
+
+# Rough OpenAI-style tokenization: ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+# JSON punctuation per ranking entry: quotes, colon, rank digits, comma
+RANKING_ENTRY_OVERHEAD_TOKENS = 4
+# Braces, keys and the "reason" field name
+RESPONSE_OVERHEAD_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used when the provider does not report usage"""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    # Each chat message carries a few tokens of role/format framing
+    return sum(estimate_tokens(message.get("content", "")) + 4 for message in messages)
+
+
+def reason_tokens() -> int:
+    """Completion budget for the free-text reason, ~1.4 tokens per word"""
+    return int(settings.RANKING_REASON_WORDS * 1.4) + 1
+
+
+def ranking_max_tokens(brands: List[str]) -> int:
+    """Size the completion budget from the brand names and reason length"""
+    entries = sum(estimate_tokens(brand) + RANKING_ENTRY_OVERHEAD_TOKENS for brand in brands)
+    budget = RESPONSE_OVERHEAD_TOKENS + entries + reason_tokens()
+    return min(budget, settings.LLM_MAX_COMPLETION_TOKENS)
+
+
+def validation_max_tokens(items: List[str]) -> int:
+    """Each item is echoed once into either the valid or the invalid list"""
+    entries = sum(estimate_tokens(item) + 2 for item in items)
+    budget = 2 * RESPONSE_OVERHEAD_TOKENS + entries + reason_tokens()
+    return min(budget, settings.LLM_MAX_COMPLETION_TOKENS)
+
+
+RANKING_SYSTEM_PROMPT = "You rank brands. Reply with JSON only."
+
+
+def ranking_messages(brands: List[str], category: str) -> List[Dict[str, str]]:
+    """Compact ranking prompt returning {"rankings": {brand: rank}, "reason": ...}"""
+    return [
+        {"role": "system", "content": RANKING_SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            f"Rank for {category} (1=best): {', '.join(brands)}\n"
+            f'Format: {{"rankings":{{"<brand>":<rank>}},"reason":"<max {settings.RANKING_REASON_WORDS} words>"}}'
+        )},
+    ]
+
+
+VALIDATION_SYSTEM_PROMPT = "You validate inputs for a brand-ranking app. Reply with JSON only."
+
+VALIDATION_RULES = {
+    "companies": "real, well-known consumer brands/companies",
+    "categories": (
+        "real product categories brands can be ranked in; be lenient "
+        '(sports like "Basketball", footwear like "Running Shoes" count)'
+    ),
+}
+
+
+def validation_messages(kind: str, items: List[str]) -> List[Dict[str, str]]:
+    """Compact validation prompt for "companies" or "categories" """
+    return [
+        {"role": "system", "content": VALIDATION_SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            f"Keep {VALIDATION_RULES[kind]}. Reject gibberish or fakes (abc, adffg, gggggg).\n"
+            f"Items: {', '.join(items)}\n"
+            f'Format: {{"valid_{kind}":[...],"invalid_{kind}":[...],"reason":"<max {settings.RANKING_REASON_WORDS} words>"}}'
+        )},
+    ]
@@ -0,0 +1,188 @@
+import asyncio
+import json
+from functools import partial
+from typing import List, Dict, Any, AsyncIterator, Tuple, Optional
+from ..core.config import settings
+from .llm import PerplexityService
+from .concurrency import upstream_limiter, ConcurrencyLimiter
+from .fairness import client_scope, current_client
+from .tournament import TournamentRanker
+from .preference_store import preference_store, PreferenceStore
+from .consensus import ConsensusRanker
+from .experiment_cache import experiment_cache, ExperimentCache
+from .deadline import within_deadline
+from .admission import admission_controller, AdmissionController
+from .priority import lane_scope, BATCH
+
+
+class RankingService:
+    """Runs per-category ranking calls through the shared upstream limiter"""
+
+    def __init__(self, llm: PerplexityService = None, limiter: ConcurrencyLimiter = None,
+                 preferences: PreferenceStore = None, experiments: ExperimentCache = None,
+                 admission: AdmissionController = None):
+        self.llm = llm or PerplexityService()
+        self.limiter = limiter or upstream_limiter
+        self.preferences = preferences or preference_store
+        self.experiments = experiments or experiment_cache
+        self.admission = admission or admission_controller
+        self.tournament = TournamentRanker(self.rank_group, group_size=settings.RANKING_GROUP_SIZE)
+        self.consensus = ConsensusRanker(
+            self.rank_sample,
+            threshold=settings.CONSENSUS_AGREEMENT_THRESHOLD,
+            min_samples=settings.CONSENSUS_MIN_SAMPLES,
+        )
+
+    @staticmethod
+    def subproblem_key(brands: List[str], category: str, samples: Optional[int] = None) -> Tuple[Tuple[str, ...], str, int]:
+        """Canonical (brand set, category) key - order of brands does not matter"""
+        return tuple(sorted(brands)), category, samples or 1
+
+    async def _upstream(self, brands: List[str], category: str, sample: Optional[int] = None) -> Dict[str, Any]:
+        # Cache misses on guarded routes are shed here, before they queue for a slot
+        self.admission.check_guarded()
+        # Queueing for a slot counts against the request deadline too
+        async with self.limiter.slot():
+            if sample is None:
+                return await self.llm.get_rankings(brands, category)
+            return await self.llm.get_rankings(brands, category, sample)
+
+    async def rank_group(self, brands: List[str], category: str) -> Dict[str, Any]:
+        """Rank a prompt-sized group of brands under the shared concurrency limiter.
+
+        Exact cache hits come first, then rankings derivable from stored pairwise
+        preferences; only uncovered sets go upstream. A fresh upstream answer
+        invalidates any cached experiment built on the old one.
+        """
+        cached = self.llm.get_cached_rankings(brands, category)
+        if cached:
+            return cached
+
+        derived = self.preferences.derive(brands, category)
+        if derived:
+            print(f"🧩 Derived {category} ranking for {brands} from pairwise preferences")
+            return derived
+
+        response = await within_deadline(self._upstream(brands, category))
+
+        self.preferences.record(category, response.get("rankings", {}))
+        self.experiments.invalidate(brands, category)
+        return response
+
+    async def rank_sample(self, brands: List[str], category: str, index: int) -> Dict[str, Any]:
+        """Draw one independently cached self-consistency sample"""
+        cached = self.llm.get_cached_rankings(brands, category, index)
+        if cached:
+            return cached
+
+        response = await within_deadline(self._upstream(brands, category, index))
+
+        self.experiments.invalidate(brands, category)
+        return response
+
+    async def rank_consensus(self, brands: List[str], category: str, samples: int) -> Dict[str, Any]:
+        """Rank a prompt-sized group by self-consistency over several samples"""
+        result = await self.consensus.rank(brands, category, samples)
+        self.preferences.record(category, result["rankings"])
+        return result
+
+    async def rank_category(self, brands: List[str], category: str, samples: Optional[int] = None) -> Dict[str, Any]:
+        """Rank brands for a single category, using the tournament engine for large sets"""
+        if samples and samples > 1:
+            rank_group = partial(self.rank_consensus, samples=samples)
+            tournament = TournamentRanker(rank_group, group_size=settings.RANKING_GROUP_SIZE)
+        else:
+            rank_group, tournament = self.rank_group, self.tournament
+
+        if len(brands) > settings.RANKING_GROUP_SIZE:
+            return await tournament.rank(brands, category)
+        return await rank_group(brands, category)
+
+    def build_result(self, brands: List[str], category_responses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Collect per-category rankings and compute average ranks"""
+        results = {"rankings": {}, "average_ranks": {}}
+        brand_scores = {brand: [] for brand in brands}
+
+        for category, response in category_responses.items():
+            results["rankings"][category] = response["rankings"]
+            agreement = response.get("metadata", {}).get("agreement")
+            if agreement is not None:
+                results.setdefault("agreement", {})[category] = agreement
+
+            # Calculate averages with case-insensitive matching
+            for response_brand, rank in response["rankings"].items():
+                # Find the original brand name (case-insensitive match)
+                original_brand = None
+                for input_brand in brands:
+                    if input_brand.lower() == response_brand.lower():
+                        original_brand = input_brand
+                        break
+
+                if original_brand:
+                    brand_scores[original_brand].append(rank)
+                else:
+                    print(f"⚠️ Warning: Could not match response brand '{response_brand}' to any input brand")
+
+        # Compute average ranks
+        for brand, scores in brand_scores.items():
+            results["average_ranks"][brand] = sum(scores) / len(scores) if scores else 0.0
+
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get upstream limiter and preference store statistics"""
+        return {
+            "upstream": self.limiter.get_stats(),
+            "preference_store": self.preferences.get_stats(),
+        }
+
+    async def rank(self, brands: List[str], categories: List[str], samples: Optional[int] = None) -> Dict[str, Any]:
+        """Rank brands across categories in parallel"""
+        responses = await asyncio.gather(*(self.rank_category(brands, category, samples) for category in categories))
+        return self.build_result(brands, dict(zip(categories, responses)))
+
+    async def rank_batch(self, jobs: List[Dict[str, Any]], client: Optional[str] = None) -> AsyncIterator[str]:
+        """Run many ranking jobs, deduplicating shared (brand set, category) subproblems.
+
+        Yields one NDJSON line per job in completion order.
+        """
+        subproblems: Dict[Tuple[Tuple[str, ...], str], asyncio.Task] = {}
+        # Tasks inherit the batch lane, so interactive requests keep priority for upstream slots,
+        # and the caller's fair-queue identity, so one big batch cannot hog the batch lane
+        with lane_scope(BATCH), client_scope(client or current_client()):
+            for job in jobs:
+                for category in job["categories"]:
+                    key = self.subproblem_key(job["brands"], category, job.get("samples"))
+                    if key not in subproblems:
+                        subproblems[key] = asyncio.ensure_future(
+                            self.rank_category(job["brands"], category, job.get("samples"))
+                        )
+
+        print(f"📦 Batch of {len(jobs)} jobs reduced to {len(subproblems)} unique ranking calls")
+
+        async def run_job(index: int, job: Dict[str, Any]) -> Dict[str, Any]:
+            brands, categories = job["brands"], job["categories"]
+            line = {"index": index, "brands": brands, "categories": categories}
+            try:
+                responses = await asyncio.gather(*(
+                    asyncio.shield(subproblems[self.subproblem_key(brands, category, job.get("samples"))])
+                    for category in categories
+                ))
+                line.update(self.build_result(brands, dict(zip(categories, responses))))
+            except Exception as e:
+                line["error"] = str(e)
+            return line
+
+        job_tasks = [asyncio.ensure_future(run_job(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(job_tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away or the stream finished - drop any outstanding work
+            for task in job_tasks + list(subproblems.values()):
+                if not task.done():
+                    task.cancel()
+
+
+# Global instance
+ranking_service = RankingService()
@@ -0,0 +1,88 @@
+import random
+import time
+import threading
+from collections import deque
+from typing import Optional, Dict, Any
+from ..core.config import settings
+from .llm_providers import LLMProviderError
+
+# Statuses worth retrying: timeouts, throttling and transient server errors
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring upstream Retry-After hints"""
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None):
+        self.max_attempts = max(1, settings.LLM_RETRY_MAX_ATTEMPTS if max_attempts is None else max_attempts)
+        self.base_delay = settings.LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.LLM_RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    @staticmethod
+    def is_retryable(error: Optional[Exception]) -> bool:
+        if not isinstance(error, LLMProviderError):
+            return False
+        # No status means the request never got a response (connection error or timeout)
+        return error.status_code is None or error.status_code in RETRYABLE_STATUS_CODES
+
+    def backoff(self, retry: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Delay before the given retry (1-based); None when Retry-After asks for longer than max_delay"""
+        if retry_after is not None:
+            # Retrying sooner than the upstream asked only earns another rejection
+            return max(0.0, retry_after) if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+class RetryBudget:
+    """Caps retries at a fraction of recent requests so retries cannot amplify an outage.
+
+    Over a sliding window, retries may not exceed `ratio` x requests, plus a
+    small per-second allowance so low-traffic periods can still retry.
+    """
+
+    def __init__(self, ratio: float = None, min_per_second: float = None, window: float = None):
+        self.ratio = settings.LLM_RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.min_per_second = settings.LLM_RETRY_BUDGET_MIN_PER_SEC if min_per_second is None else min_per_second
+        self.window = settings.LLM_RETRY_BUDGET_WINDOW if window is None else window
+        self._requests = deque()
+        self._retries = deque()
+        self.lock = threading.Lock()
+        # Reporting
+        self.retries_total = 0
+        self.rejected_total = 0
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Withdraw one retry from the budget; False when it is exhausted"""
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = self.ratio * len(self._requests) + self.min_per_second * self.window
+            if len(self._retries) + 1 > allowed:
+                self.rejected_total += 1
+                return False
+            self._retries.append(now)
+            self.retries_total += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._trim(time.monotonic())
+            return {
+                "ratio": self.ratio,
+                "window_requests": len(self._requests),
+                "window_retries": len(self._retries),
+                "retries_total": self.retries_total,
+                "rejected_total": self.rejected_total,
+            }
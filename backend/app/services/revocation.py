@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import math
+import time
+import threading
+from typing import Dict, Any, Optional
+from sqlalchemy import event, inspect
+from ..core.config import settings
+from ..models.user import User
+from ..utils.cache import redis_client, REDIS_AVAILABLE
+
+REVOKED_TOKENS_KEY = "auth:revoked_tokens"
+REVOKED_USERS_KEY = "auth:revoked_users"
+
+# Changing any of these ends the user's existing sessions
+SESSION_FIELDS = ("username", "is_active", "hashed_password")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for a capacity and false-positive rate"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def fill_ratio(self) -> float:
+        return sum(bin(byte).count("1") for byte in self._bits) / self.size
+
+
+class RevocationList:
+    """Revoked token ids and per-user session cutoffs for stateless auth.
+
+    The hot path is an in-memory Bloom filter of revoked `jti`s plus a small
+    dict of per-user cutoffs, so a valid token is checked without I/O. Only
+    filter positives are confirmed against the exact set (Redis, or memory
+    when Redis is unavailable). Every worker rebuilds its filter from Redis
+    every `sync_interval` seconds to pick up revocations made elsewhere.
+    """
+
+    def __init__(self, use_redis: bool = REDIS_AVAILABLE, capacity: int = None, error_rate: float = None,
+                 sync_interval: float = None):
+        self.use_redis = use_redis
+        self.capacity = settings.REVOCATION_FILTER_CAPACITY if capacity is None else capacity
+        self.error_rate = settings.REVOCATION_FILTER_ERROR_RATE if error_rate is None else error_rate
+        self.sync_interval = settings.REVOCATION_SYNC_INTERVAL if sync_interval is None else sync_interval
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._revoked: Dict[str, float] = {}
+        self._user_cutoffs: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.lock = threading.Lock()
+        # Reporting
+        self.checks = 0
+        self.filter_positives = 0
+        self.rejected = 0
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke one token until it would have expired anyway"""
+        try:
+            if self.use_redis:
+                redis_client.zadd(REVOKED_TOKENS_KEY, {jti: expires_at})
+        except Exception as e:
+            print(f"Revocation store write error: {e}")
+        with self.lock:
+            if not self.use_redis:
+                self._revoked[jti] = expires_at
+            self._filter.add(jti)
+
+    def revoke_user(self, user_id: int) -> None:
+        """Revoke every token issued to a user up to now"""
+        cutoff = time.time()
+        try:
+            if self.use_redis:
+                redis_client.hset(REVOKED_USERS_KEY, str(user_id), cutoff)
+        except Exception as e:
+            print(f"Revocation store write error: {e}")
+        with self.lock:
+            self._user_cutoffs[user_id] = cutoff
+
+    def _confirm(self, jti: str) -> bool:
+        if not self.use_redis:
+            with self.lock:
+                return self._revoked.get(jti, 0) > time.time()
+        try:
+            return redis_client.zscore(REVOKED_TOKENS_KEY, jti) is not None
+        except Exception as e:
+            # Fail closed - this only affects tokens that already hit the filter
+            print(f"Revocation store read error: {e}")
+            return True
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        """Whether a decoded token has been revoked, by id or by a later user cutoff"""
+        jti, user_id, issued_at = claims.get("jti"), claims.get("uid"), claims.get("iat")
+        with self.lock:
+            self.checks += 1
+            cutoff = self._user_cutoffs.get(user_id)
+            revoked = cutoff is not None and (issued_at is None or issued_at < cutoff)
+            maybe = not revoked and jti is not None and jti in self._filter
+            if maybe:
+                self.filter_positives += 1
+        if maybe:
+            revoked = self._confirm(jti)
+        if revoked:
+            with self.lock:
+                self.rejected += 1
+        return revoked
+
+    def sync(self) -> None:
+        """Rebuild the filter and user cutoffs from the shared store, dropping expired entries"""
+        now = time.time()
+        # Cutoffs older than the longest token lifetime can no longer match anything
+        oldest_live = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        if self.use_redis:
+            redis_client.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+            jtis = [jti.decode() if isinstance(jti, bytes) else jti for jti in redis_client.zrange(REVOKED_TOKENS_KEY, 0, -1)]
+            cutoffs = {int(uid): float(cutoff) for uid, cutoff in redis_client.hgetall(REVOKED_USERS_KEY).items()}
+        else:
+            with self.lock:
+                jtis = [jti for jti, expires_at in self._revoked.items() if expires_at > now]
+                cutoffs = dict(self._user_cutoffs)
+
+        rebuilt = BloomFilter(max(self.capacity, len(jtis)), self.error_rate)
+        for jti in jtis:
+            rebuilt.add(jti)
+        with self.lock:
+            self._filter = rebuilt
+            if not self.use_redis:
+                self._revoked = {jti: self._revoked[jti] for jti in jtis}
+            self._user_cutoffs = {uid: cutoff for uid, cutoff in cutoffs.items() if cutoff > oldest_live}
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"❌ Revocation list sync error: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self) -> None:
+        """Start the periodic sync on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get filter size and check counts"""
+        with self.lock:
+            return {
+                "revoked_tokens": self._filter.count,
+                "revoked_users": len(self._user_cutoffs),
+                "filter_bits": self._filter.size,
+                "filter_fill_ratio": round(self._filter.fill_ratio(), 4),
+                "checks": self.checks,
+                "filter_positives": self.filter_positives,
+                "rejected": self.rejected,
+            }
+
+
+# Global instance shared by every auth dependency
+revocation_list = RevocationList()
+
+
+@event.listens_for(User, "after_update")
+def _revoke_changed_user(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SESSION_FIELDS):
+        revocation_list.revoke_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _revoke_deleted_user(mapper, connection, target: User) -> None:
+    revocation_list.revoke_user(target.id)
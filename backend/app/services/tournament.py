@@ -0,0 +1,94 @@
+import asyncio
+from typing import List, Dict, Any, Callable, Awaitable
+
+RankGroup = Callable[[List[str], str], Awaitable[Dict[str, Any]]]
+
+
+class TournamentRanker:
+    """Ranks brand sets larger than a single prompt can handle.
+
+    The set is split into prompt-sized groups that are ranked in parallel,
+    then the sorted runs are merged pairwise (merge sort). Each merge step
+    ranks a window holding the heads of both runs in one prompt; the window
+    that is not exhausted carries over into the next prompt, so consecutive
+    groups overlap and each LLM call settles at least half a window.
+    """
+
+    def __init__(self, rank_group: RankGroup, group_size: int = 5):
+        self.rank_group = rank_group
+        self.group_size = max(2, group_size)
+
+    @staticmethod
+    def _order_group(group: List[str], response: Dict[str, Any]) -> List[str]:
+        """Turn a {brand: rank} response into an ordered list of the group members"""
+        ranks = {brand.lower(): rank for brand, rank in response.get("rankings", {}).items()}
+        fallback = len(group) + 1
+        # Python's sort is stable, so unranked brands keep their input order at the end
+        return sorted(group, key=lambda brand: ranks.get(brand.lower(), fallback))
+
+    async def _sort_group(self, group: List[str], category: str, stats: Dict[str, int]) -> List[str]:
+        stats["llm_calls"] += 1
+        response = await self.rank_group(group, category)
+        return self._order_group(group, response)
+
+    async def _merge(self, left: List[str], right: List[str], category: str, stats: Dict[str, int]) -> List[str]:
+        """Merge two sorted runs, preserving each run's internal order"""
+        merged = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            take_left = min(len(left) - i, self.group_size // 2)
+            take_right = min(len(right) - j, self.group_size - take_left)
+            take_left = min(len(left) - i, self.group_size - take_right)
+            window_left = left[i:i + take_left]
+            window_right = right[j:j + take_right]
+
+            ordered = await self._sort_group(window_left + window_right, category, stats)
+            from_left = set(window_left)
+
+            # Emit until one side's window is used up; past that point an unseen
+            # member of that run could outrank what remains of the other window.
+            used_left = used_right = 0
+            for brand in ordered:
+                if brand in from_left:
+                    merged.append(left[i + used_left])
+                    used_left += 1
+                else:
+                    merged.append(right[j + used_right])
+                    used_right += 1
+                if used_left == take_left or used_right == take_right:
+                    break
+            i += used_left
+            j += used_right
+
+        merged.extend(left[i:])
+        merged.extend(right[j:])
+        return merged
+
+    async def rank(self, brands: List[str], category: str) -> Dict[str, Any]:
+        """Produce a global ranking over an arbitrarily large brand set"""
+        stats = {"llm_calls": 0}
+        brands = list(dict.fromkeys(brands))
+        groups = [brands[i:i + self.group_size] for i in range(0, len(brands), self.group_size)]
+        runs = list(await asyncio.gather(*(self._sort_group(group, category, stats) for group in groups)))
+
+        merge_rounds = 0
+        while len(runs) > 1:
+            pairs = [runs[i:i + 2] for i in range(0, len(runs), 2)]
+            runs = list(await asyncio.gather(*(
+                self._merge(pair[0], pair[1], category, stats) if len(pair) == 2 else asyncio.sleep(0, result=pair[0])
+                for pair in pairs
+            )))
+            merge_rounds += 1
+
+        order = runs[0] if runs else []
+        return {
+            "rankings": {brand: position + 1 for position, brand in enumerate(order)},
+            "reason": f"Merged from {stats['llm_calls']} group rankings of up to {self.group_size} brands",
+            "metadata": {
+                "strategy": "tournament",
+                "group_size": self.group_size,
+                "initial_groups": len(groups),
+                "merge_rounds": merge_rounds,
+                "llm_calls": stats["llm_calls"],
+            },
+        }
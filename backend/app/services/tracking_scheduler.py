@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import sessionmaker
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.tracking import TrackedExperiment, TrackedSnapshot
+from .ranking_service import ranking_service, RankingService
+from .priority import lane_scope, BACKGROUND
+from .fairness import client_scope, user_client
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def rank_deltas(previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Ranks in `current` that differ from `previous`, per category"""
+    changes = {}
+    for category, rankings in current.items():
+        before = previous.get(category, {})
+        moved = {brand: rank for brand, rank in rankings.items() if before.get(brand) != rank}
+        if moved:
+            changes[category] = moved
+    return changes
+
+
+class TrackingScheduler:
+    """Background loop that refreshes due tracked experiments.
+
+    Refreshes go through the normal ranking pipeline, so they share the
+    rankings cache, preference store and upstream limiter with live traffic.
+    Only rank changes versus the previous run are written as snapshots.
+
+    Database work goes through async sessions so polls and commits never
+    block the event loop, and no connection is held while ranking runs.
+    """
+
+    def __init__(self, session_factory: sessionmaker = None, ranking: RankingService = None,
+                 poll_interval: float = None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.ranking = ranking or ranking_service
+        self.poll_interval = settings.TRACKING_POLL_INTERVAL if poll_interval is None else poll_interval
+        self._task: Optional[asyncio.Task] = None
+        # Reporting
+        self.runs = 0
+        self.failures = 0
+        self.snapshots_written = 0
+
+    async def refresh(self, tracked: TrackedExperiment, now: datetime) -> Optional[Dict[str, Any]]:
+        """Re-rank one tracked experiment, update its schedule and return its rank changes, if any"""
+        with lane_scope(BACKGROUND), client_scope(user_client(tracked.user_id)):
+            responses = await asyncio.gather(*(
+                self.ranking.rank_category(tracked.companies, category) for category in tracked.categories
+            ))
+        current = {category: response.get("rankings", {}) for category, response in zip(tracked.categories, responses)}
+        changes = rank_deltas(tracked.latest_rankings or {}, current)
+
+        tracked.latest_rankings = current
+        tracked.last_run_at = now
+        tracked.next_run_at = now + timedelta(seconds=tracked.interval_seconds)
+        self.runs += 1
+        return changes or None
+
+    async def run_due(self) -> int:
+        """Refresh every active tracked experiment whose next run is due"""
+        now = _utcnow()
+        async with self.session_factory() as db:
+            due: List[TrackedExperiment] = (await db.execute(
+                select(TrackedExperiment).where(
+                    TrackedExperiment.is_active == True,  # noqa: E712
+                    or_(TrackedExperiment.next_run_at == None, TrackedExperiment.next_run_at <= now),  # noqa: E711
+                ).order_by(TrackedExperiment.next_run_at)
+            )).scalars().all()
+
+        # The rows are detached here; each refresh is written back in its own short session
+        for tracked in due:
+            try:
+                changes = await self.refresh(tracked, now)
+                async with self.session_factory() as db:
+                    db.add(tracked)
+                    if changes:
+                        db.add(TrackedSnapshot(tracked_experiment_id=tracked.id, run_at=now, changes=changes))
+                    await db.commit()
+                if changes:
+                    self.snapshots_written += 1
+                print(f"📈 Tracked experiment {tracked.id} refreshed, {len(changes or {})} categories moved")
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Tracked experiment {tracked.id} refresh failed: {e}")
+                # Back off instead of retrying on every poll
+                async with self.session_factory() as db:
+                    await db.execute(
+                        update(TrackedExperiment).where(TrackedExperiment.id == tracked.id)
+                        .values(next_run_at=now + timedelta(seconds=settings.TRACKING_RETRY_DELAY))
+                    )
+                    await db.commit()
+        return len(due)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                print(f"❌ Tracking scheduler error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Start the background loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+            print(f"⏱️ Tracking scheduler started (poll every {self.poll_interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler statistics"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "snapshots_written": self.snapshots_written,
+        }
+
+
+# Global instance
+tracking_scheduler = TrackingScheduler()
@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+from sqlalchemy import event
+from ..core.config import settings
+from ..models.user import User
+
+
+class UserCache:
+    """TTL-bounded LRU of verified bearer tokens to detached user snapshots.
+
+    A hit skips both JWT decoding and the user lookup. Entries never outlive
+    their token's own expiry and are dropped as soon as the user row is
+    updated or deleted through the ORM in this process; other workers see the
+    change once the entry's TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self.max_entries = settings.AUTH_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = settings.AUTH_CACHE_TTL if ttl is None else ttl
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self.lock = threading.Lock()
+        # Reporting
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def snapshot(user: User) -> User:
+        """Copy of the user's columns, not bound to any session"""
+        return User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+
+    def get(self, token: str) -> Optional[User]:
+        with self.lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token: str, user: User, token_expires_at: Optional[float] = None) -> None:
+        """Cache a verified token until the TTL or the token's own expiry, whichever is first"""
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        snapshot = self.snapshot(user)
+        with self.lock:
+            self._drop(token)
+            self._entries[token] = (snapshot, expires_at)
+            self._tokens_by_user.setdefault(snapshot.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+    def discard(self, token: str) -> None:
+        with self.lock:
+            self._drop(token)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Forget every cached token of a changed or deleted user"""
+        with self.lock:
+            tokens = self._tokens_by_user.pop(user_id, set())
+            for token in tokens:
+                self._entries.pop(token, None)
+            if tokens:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit rate"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 2) if total else 0,
+                "invalidations": self.invalidations,
+            }
+
+
+# Global instance shared by both auth dependencies
+user_cache = UserCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    user_cache.invalidate_user(target.id)
@@ -1,17 +1,22 @@
 import asyncio
-import httpx
 import json
 import hashlib
 import time
 from typing import List, Tuple, Dict, Any, Set
 from ..core.config import settings
+from .llm_router import llm_router, LLMRouter
+from .admission import admission_controller, Overloaded
+from .concurrency import validation_limiter, ConcurrencyLimiter, traffic_scope, VALIDATION
+from .prompts import validation_messages, validation_max_tokens
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ValidationService:
-    def __init__(self):
-        self.perplexity_api_key = settings.PERPLEXITY_API_KEY
+    def __init__(self, limiter: ConcurrencyLimiter = None, router: LLMRouter = None):
+        # Validation has its own bulkhead so a burst of form checks cannot starve ranking
+        self.limiter = limiter or validation_limiter
+        self.router = router or llm_router
         # In-memory cache for instant validation
         self._company_cache: Dict[str, bool] = {}
         self._category_cache: Dict[str, bool] = {}
@@ -19,7 +24,7 @@ class ValidationService:
         self._cache_hits = 0
         self._cache_misses = 0
         self._api_calls = 0
-        logger.info(f"ValidationService initialized with Perplexity API key: {'SET' if self.perplexity_api_key else 'NOT SET'}")
+        logger.info(f"ValidationService initialized with LLM providers: {[provider.name for provider in self.router.providers]}")
         
     def get_performance_stats(self) -> Dict[str, Any]:
         """Get performance statistics"""
@@ -80,6 +85,8 @@ class ValidationService:
             # Batch validate uncached companies for efficiency
             if uncached_companies:
                 logger.info(f"Validating uncached companies: {uncached_companies}")
+                # Only cache misses are subject to load shedding
+                admission_controller.check()
                 self._api_calls += 1
                 batch_valid, batch_valid_items, batch_invalid_items, error = await self._validate_companies_batch(uncached_companies)
                 
@@ -105,6 +112,8 @@ class ValidationService:
                 logger.info(f"Companies validation failed in {time.time() - start_time:.3f}s")
                 return False, valid_companies, f"Invalid companies: {', '.join(invalid_companies)}"
                 
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Company validation error: {e}")
             return False, [], "Validation service error. Please try again."
@@ -149,6 +158,8 @@ class ValidationService:
             # Batch validate uncached categories for efficiency
             if uncached_categories:
                 logger.info(f"Validating uncached categories: {uncached_categories}")
+                # Only cache misses are subject to load shedding
+                admission_controller.check()
                 self._api_calls += 1
                 batch_valid, batch_valid_items, batch_invalid_items, error = await self._validate_categories_batch(uncached_categories)
                 
@@ -174,6 +185,8 @@ class ValidationService:
                 logger.info(f"Categories validation failed in {time.time() - start_time:.3f}s")
                 return False, valid_categories, f"Invalid categories: {', '.join(invalid_categories)}"
                 
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Category validation error: {e}")
             return False, [], "Validation service error. Please try again."
@@ -181,26 +194,11 @@ class ValidationService:
     async def _validate_companies_batch(self, companies: List[str]) -> Tuple[bool, List[str], List[str], str]:
         """Validate a batch of companies using AI for efficiency"""
         try:
-            prompt = f"""Validate if these are real companies/brands. Respond ONLY with valid JSON in this exact format:
-{{
-    "valid_companies": ["list of real companies"],
-    "invalid_companies": ["list of fake/invalid companies"],
-    "reason": "brief explanation"
-}}
-
-Companies to validate: {', '.join(companies)}
-
-Rules:
-- Only include well-known, real companies/brands that can be ranked in product categories
-- Valid examples: Nike, Adidas, Apple, Samsung, H&M, Zara, Starbucks, Toyota, BMW
-- Exclude single letters, random characters, or obvious fake names like "abc", "def", "adffg", "gggggg"
-- Companies should be recognizable brands that consumers would know
-- If a company name is unclear or fake, mark it as invalid
-- Respond with ONLY the JSON, no other text"""
-
-            system_content = "You are a company validation expert. You must respond with ONLY valid JSON, no other text or explanations."
-
-            response = await self._make_perplexity_request(prompt, system_content)
+            response = await self._make_llm_request(
+                validation_messages("companies", companies),
+                validation_max_tokens(companies),
+                {"type": "validate_companies", "items": companies},
+            )
             
             # Parse AI response
             content = response.get('content', '{}')
@@ -233,28 +231,11 @@ Rules:
     async def _validate_categories_batch(self, categories: List[str]) -> Tuple[bool, List[str], List[str], str]:
         """Validate a batch of categories using AI for efficiency"""
         try:
-            prompt = f"""Validate if these are real product categories. Respond ONLY with valid JSON in this exact format:
-{{
-    "valid_categories": ["list of real product categories"],
-    "invalid_categories": ["list of fake/invalid categories"],
-    "reason": "brief explanation"
-}}
-
-Categories to validate: {', '.join(categories)}
-
-Rules:
-- Accept broad product categories that companies can be ranked in
-- Valid examples: Smartphones, Laptops, Sneakers, Running Shoes, Basketball, Football, T-Shirts, Coffee, Cars, Jeans, Shirts
-- Accept sports categories like "Basketball", "Football", "Tennis" as they represent product categories
-- Accept footwear categories like "Running Shoes", "Basketball Shoes", "Casual Shoes"
-- Exclude single letters, random characters, or obvious fake categories like "abc", "def", "adffg", "gggggg"
-- Be lenient with category names - if it makes sense as a product category, accept it
-- If a category is unclear or fake, mark it as invalid
-- Respond with ONLY the JSON, no other text"""
-
-            system_content = "You are a product category validation expert. You must respond with ONLY valid JSON, no other text or explanations."
-
-            response = await self._make_perplexity_request(prompt, system_content)
+            response = await self._make_llm_request(
+                validation_messages("categories", categories),
+                validation_max_tokens(categories),
+                {"type": "validate_categories", "items": categories},
+            )
             
             # Parse AI response
             content = response.get('content', '{}')
@@ -284,41 +265,21 @@ Rules:
             logger.error(error_msg)
             return False, [], categories, error_msg
 
-    async def _make_perplexity_request(self, prompt: str, system_content: str) -> Dict[str, Any]:
-        """Make request to Perplexity API with optimized timeout"""
-        logger.info(f"Making Perplexity API request with key: {'SET' if self.perplexity_api_key else 'NOT SET'}")
-        
-        if not self.perplexity_api_key:
-            logger.error("Perplexity API key is not set!")
-            raise Exception("Perplexity API key is not configured")
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    "https://api.perplexity.ai/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.perplexity_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "sonar-pro",
-                        "messages": [
-                            {"role": "system", "content": system_content},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "max_tokens": 500
-                    },
-                    timeout=8.0  # Reduced timeout for faster response
-                )
-                logger.info(f"Perplexity API response status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    logger.error(f"Perplexity API error: {response.status_code} - {response.text}")
-                    raise Exception(f"API returned status {response.status_code}: {response.text}")
-                
-                result = response.json()["choices"][0]["message"]
-                logger.info(f"Perplexity API response content: {result}")
-                return result
-            except Exception as e:
-                logger.error(f"Perplexity API request failed: {e}")
-                raise
\ No newline at end of file
+    async def _make_llm_request(self, messages: List[Dict[str, str]], max_tokens: int, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Make request through the LLM router, within the validation bulkhead"""
+        try:
+            # Tagged as validation traffic, the call also stays out of the provider
+            # slots and key tokens reserved for ranking
+            async with self.limiter.slot():
+                with traffic_scope(VALIDATION):
+                    result = await self.router.complete(
+                        messages,
+                        max_tokens=max_tokens,
+                        timeout=8.0,  # Reduced timeout for faster response
+                        task=task,
+                    )
+            logger.info(f"LLM response from {result['provider']} ({result['model']}): {result['content']}")
+            return result
+        except Exception as e:
+            logger.error(f"LLM request failed: {e}")
+            raise
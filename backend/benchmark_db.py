@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the experiment-list query under concurrency with the sync Session
+the async routes used before, against the AsyncSession they use now.
+
+Alongside throughput it reports event-loop lag: a ticker coroutine runs while
+the queries do, and every millisecond the loop is blocked by a sync query
+shows up as lag for every other request on the worker.
+
+Seeding drops and recreates every table, so a --database-url other than
+the default temporary SQLite file is refused unless --reset is given.
+
+Usage:
+    python benchmark_db.py [--database-url URL --reset] [--requests 500] [--concurrency 50] [--experiments 200]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, async_database_url
+from app.models.user import User
+from app.models.experiment import Experiment
+
+
+def seed(url: str, experiments: int) -> int:
+    """Recreate every table in `url` and fill it with one user's experiments"""
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    results = {"Category": {"rankings": {"A": 1, "B": 2, "C": 3}, "reason": "", "metadata": {}}}
+    db.add_all([
+        Experiment(user_id=user.id, companies=["A", "B", "C"], categories=["Category"],
+                   results=results, average_ranks={"A": 1.0, "B": 2.0, "C": 3.0})
+        for _ in range(experiments)
+    ])
+    db.commit()
+    user_id = user.id
+    db.close()
+    engine.dispose()
+    return user_id
+
+
+async def measure(query, requests: int, concurrency: int):
+    """Run `requests` queries, `concurrency` at a time; returns (req/s, max loop lag in ms)"""
+    lag = {"max": 0.0}
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag["max"] = max(lag["max"], time.perf_counter() - started - 0.001)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await query()
+
+    tick = asyncio.ensure_future(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return requests / elapsed, lag["max"] * 1000
+
+
+async def run(url: str, requests: int, concurrency: int, user_id: int) -> None:
+    sync_engine = create_engine(url)
+    SyncSession = sessionmaker(bind=sync_engine)
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession)
+    statement = select(Experiment).where(Experiment.user_id == user_id).order_by(Experiment.created_at.desc())
+
+    async def sync_query():
+        # What the routes did before: a blocking query inside a coroutine
+        db = SyncSession()
+        try:
+            db.execute(statement).scalars().all()
+        finally:
+            db.close()
+
+    async def async_query():
+        async with AsyncSessionLocal() as db:
+            (await db.execute(statement)).scalars().all()
+
+    print(f"{'session':<14}{'req/s':>10}{'max loop lag (ms)':>20}")
+    for name, query in (("sync", sync_query), ("async", async_query)):
+        await query()  # warm up the pool
+        throughput, max_lag = await measure(query, requests, concurrency)
+        print(f"{name:<14}{throughput:>10.1f}{max_lag:>20.1f}")
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Database to benchmark (default: a temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--experiments", type=int, default=200, help="Experiments stored for the benchmark user")
+    parser.add_argument("--reset", action="store_true",
+                        help="Allow dropping and recreating every table in --database-url")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is not None and not args.reset:
+        parser.error("seeding drops every table in --database-url; pass --reset to confirm it is disposable")
+    if url is None:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    print(f"🏁 {args.requests} requests, {args.concurrency} concurrent, {args.experiments} experiments on {url}")
+    user_id = seed(url, args.experiments)
+    asyncio.run(run(url, args.requests, args.concurrency, user_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.models.user import User
 from app.models.experiment import Experiment
+from app.models.tracking import TrackedExperiment, TrackedSnapshot
 from app.core.database import Base
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,63 @@
+"""Add tracked experiments and snapshots
+
+Revision ID: 3f9a1c7d2b64
+Revises: eeb96b1f70b8
+Create Date: 2026-10-19 10:12:41.208311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b64'
+down_revision: Union[str, Sequence[str], None] = 'eeb96b1f70b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tracked_experiments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=True),
+        sa.Column('companies', sa.JSON(), nullable=True),
+        sa.Column('categories', sa.JSON(), nullable=True),
+        sa.Column('interval_seconds', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('latest_rankings', sa.JSON(), nullable=True),
+        sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('next_run_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tracked_experiments_id'), 'tracked_experiments', ['id'], unique=False)
+    op.create_index(op.f('ix_tracked_experiments_user_id'), 'tracked_experiments', ['user_id'], unique=False)
+    op.create_index(op.f('ix_tracked_experiments_next_run_at'), 'tracked_experiments', ['next_run_at'], unique=False)
+    op.create_table(
+        'tracked_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tracked_experiment_id', sa.Integer(), nullable=True),
+        sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['tracked_experiment_id'], ['tracked_experiments.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tracked_snapshots_id'), 'tracked_snapshots', ['id'], unique=False)
+    op.create_index(op.f('ix_tracked_snapshots_tracked_experiment_id'), 'tracked_snapshots', ['tracked_experiment_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tracked_snapshots_tracked_experiment_id'), table_name='tracked_snapshots')
+    op.drop_index(op.f('ix_tracked_snapshots_id'), table_name='tracked_snapshots')
+    op.drop_table('tracked_snapshots')
+    op.drop_index(op.f('ix_tracked_experiments_next_run_at'), table_name='tracked_experiments')
+    op.drop_index(op.f('ix_tracked_experiments_user_id'), table_name='tracked_experiments')
+    op.drop_index(op.f('ix_tracked_experiments_id'), table_name='tracked_experiments')
+    op.drop_table('tracked_experiments')
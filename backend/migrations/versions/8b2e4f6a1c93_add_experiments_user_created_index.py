@@ -0,0 +1,28 @@
+"""Add composite index for paging a user's experiments
+
+Revision ID: 8b2e4f6a1c93
+Revises: 3f9a1c7d2b64
+Create Date: 2026-10-19 16:40:12.583104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f6a1c93'
+down_revision: Union[str, Sequence[str], None] = '3f9a1c7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_experiments_user_created', 'experiments', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_experiments_user_created', table_name='experiments')
@@ -1,13 +1,20 @@
+import os
+
+# Run the suite against the local stub LLM provider - no network or API keys needed
+os.environ.setdefault("LLM_PROVIDERS", "stub")
+# Tests drive tracked-experiment refreshes explicitly instead of via the background loop
+os.environ.setdefault("TRACKING_SCHEDULER_ENABLED", "false")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool, NullPool
 from app.main import app
-from app.core.database import get_db, Base
+from app.core.database import get_db, get_async_db, async_database_url, Base
 from app.models.user import User
 from app.services.auth_service import AuthService
-import os
 
 # Test database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -22,6 +29,11 @@ engine = create_engine(
 # Create test session
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine on the same database for routes using get_async_db; connections are not
+# pooled because each test client runs its own event loop
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Auth service for testing
 auth_service = AuthService()
 
@@ -36,6 +48,51 @@ def db_session():
         session.close()
         Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def fresh_preference_store(monkeypatch):
+    """Give each test an empty in-memory pairwise preference store"""
+    from app.services.preference_store import PreferenceStore
+    from app.services.ranking_service import ranking_service
+    monkeypatch.setattr(ranking_service, "preferences", PreferenceStore(use_redis=False))
+
+@pytest.fixture(autouse=True)
+def fresh_experiment_cache(monkeypatch):
+    """Give each test an empty in-memory whole-experiment cache"""
+    import app.main
+    from app.services.experiment_cache import ExperimentCache
+    from app.services.ranking_service import ranking_service
+    cache = ExperimentCache(use_redis=False)
+    monkeypatch.setattr(app.main, "experiment_cache", cache)
+    monkeypatch.setattr(ranking_service, "experiments", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def fresh_idempotency_store(monkeypatch):
+    """Give each test an empty in-memory idempotency store"""
+    import app.main
+    from app.services.idempotency import IdempotencyStore
+    store = IdempotencyStore(use_redis=False)
+    monkeypatch.setattr(app.main, "idempotency_store", store)
+    return store
+
+@pytest.fixture(autouse=True)
+def fresh_user_cache():
+    """Start each test with an empty token -> user cache (the test database is recreated per test)"""
+    from app.services.user_cache import user_cache
+    user_cache.clear()
+    return user_cache
+
+@pytest.fixture(autouse=True)
+def fresh_revocation_list(monkeypatch):
+    """Give each test an empty in-memory revocation list"""
+    import app.services.revocation
+    import app.services.auth_service
+    from app.services.revocation import RevocationList
+    revocations = RevocationList(use_redis=False)
+    monkeypatch.setattr(app.services.revocation, "revocation_list", revocations)
+    monkeypatch.setattr(app.services.auth_service, "revocation_list", revocations)
+    return revocations
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """Create a test client with database dependency override"""
@@ -45,7 +102,12 @@ def client(db_session):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
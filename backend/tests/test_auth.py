@@ -167,4 +167,173 @@ class TestAuthentication:
         headers = {"Authorization": "Bearer"}
         response = client.get("/test-auth", headers=headers)
         assert response.status_code == 401
-        assert "Invalid authentication credentials" in response.json()["detail"] 
\ No newline at end of file
+        assert "Invalid authentication credentials" in response.json()["detail"] 
+
+class TestUserCache:
+    """Test the verified token -> user cache in front of authenticated routes"""
+    
+    @pytest.fixture
+    def legacy_headers(self, auth_headers):
+        """Token issued before user claims were added - only carries the username"""
+        token = AuthService().create_access_token(data={"sub": "testuser"})
+        return {"Authorization": f"Bearer {token}"}
+    
+    def test_repeat_request_skips_lookup(self, client, legacy_headers, fresh_user_cache):
+        """Test that the second request with a token is served from the cache"""
+        first = client.get("/test-auth", headers=legacy_headers)
+        second = client.get("/test-auth", headers=legacy_headers)
+        
+        assert first.status_code == 200
+        assert second.json() == first.json()
+        stats = fresh_user_cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == 50.0
+    
+    def test_user_change_invalidates_entries(self, client, legacy_headers, db_session, fresh_user_cache):
+        """Test that updating the user row drops its cached tokens"""
+        from app.models.user import User
+        client.get("/test-auth", headers=legacy_headers)
+        assert fresh_user_cache.get_stats()["size"] == 1
+        
+        user = db_session.query(User).filter(User.username == "testuser").first()
+        user.is_active = False
+        db_session.commit()
+        
+        assert fresh_user_cache.get_stats()["size"] == 0
+        assert fresh_user_cache.get_stats()["invalidations"] == 1
+    
+    def test_entry_expiry_and_eviction(self):
+        """Test that entries are not served past their token's expiry or beyond the size cap"""
+        import time
+        from app.models.user import User
+        from app.services.user_cache import UserCache
+        cache = UserCache(max_entries=2, ttl=60)
+        user = User(id=1, username="cached", email="cached@example.com", is_active=True)
+        
+        cache.set("expired", user, token_expires_at=time.time() - 1)
+        assert cache.get("expired") is None
+        
+        cache.set("fresh", user)
+        cache.set("newer", user)
+        cache.set("newest", user)
+        
+        assert cache.get("fresh") is None  # evicted as least recently used
+        assert cache.get("newest").username == "cached"
+
+
+class TestStatelessAuth:
+    """Test signed user claims and token revocation"""
+    
+    def test_claims_authenticate_without_lookup(self, client, auth_headers, fresh_user_cache):
+        """Test that a token with user claims is accepted without touching the user cache or database"""
+        response = client.get("/test-auth", headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert "testuser" in response.json()["message"]
+        assert fresh_user_cache.get_stats()["misses"] == 0
+    
+    def test_logout_revokes_token(self, client, auth_headers):
+        """Test that a logged-out token is rejected while a fresh login still works"""
+        assert client.post("/api/auth/logout", headers=auth_headers).status_code == 200
+        
+        assert client.get("/test-auth", headers=auth_headers).status_code == 401
+        assert client.get("/api/tracking/", headers=auth_headers).status_code == 401
+        
+        login = client.post("/api/auth/login", json={"username": "testuser", "password": "testpassword123"})
+        fresh = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        assert client.get("/test-auth", headers=fresh).status_code == 200
+    
+    def test_deactivation_revokes_existing_tokens(self, client, auth_headers, db_session):
+        """Test that deactivating a user ends sessions issued before the change"""
+        from app.models.user import User
+        user = db_session.query(User).filter(User.username == "testuser").first()
+        user.is_active = False
+        db_session.commit()
+        
+        assert client.get("/test-auth", headers=auth_headers).status_code == 401
+    
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every revoked id is found and unrelated ids are confirmed before rejection"""
+        import time
+        from app.services.revocation import RevocationList
+        revocations = RevocationList(use_redis=False, capacity=100, error_rate=0.01)
+        for index in range(100):
+            revocations.revoke(f"revoked-{index}", time.time() + 60)
+        
+        assert all(revocations.is_revoked({"jti": f"revoked-{index}"}) for index in range(100))
+        assert not any(revocations.is_revoked({"jti": f"valid-{index}"}) for index in range(1000))
+        stats = revocations.get_stats()
+        assert stats["rejected"] == 100
+        assert stats["filter_positives"] < 100 + 50
+
+
+class TestPasswordHashing:
+    """Test the bounded bcrypt pool and rehash-on-login"""
+    
+    def test_login_upgrades_outdated_hash(self, client, db_session):
+        """Test that a hash with an old work factor is replaced after a successful login"""
+        from app.models.user import User
+        from app.services.password_hasher import pwd_context
+        from app.core.config import settings
+        user = User(email="old@example.com", username="olduser",
+                    hashed_password=pwd_context.copy(bcrypt__rounds=4).hash("oldpassword"))
+        db_session.add(user)
+        db_session.commit()
+        
+        response = client.post("/api/auth/login", json={"username": "olduser", "password": "oldpassword"})
+        
+        assert response.status_code == 200
+        db_session.expire_all()
+        stored = db_session.query(User).filter(User.username == "olduser").first().hashed_password
+        assert stored.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+        assert pwd_context.verify("oldpassword", stored)
+        token = response.json()["access_token"]
+        assert client.get("/test-auth", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    
+    def test_pool_sheds_beyond_queue_cap(self):
+        """Test that hashing beyond workers plus queue is rejected rather than queued"""
+        import asyncio
+        from passlib.context import CryptContext
+        from app.services.admission import Overloaded
+        from app.services.password_hasher import PasswordHasher
+        hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=10), max_workers=1, max_queued=1)
+        
+        async def scenario():
+            results = await asyncio.gather(*(hasher.hash("secret") for _ in range(3)), return_exceptions=True)
+            return results
+        
+        results = asyncio.run(scenario())
+        
+        assert sum(isinstance(result, Overloaded) for result in results) == 1
+        assert hasher.get_stats()["completed"] == 2
+        assert hasher.get_stats()["rejected"] == 1
+
+
+class TestRegistrationQueries:
+    """Test that registration is a single INSERT"""
+    
+    def test_register_issues_one_statement(self, client, test_user_data):
+        """Test that signup and duplicate detection each take one statement"""
+        from sqlalchemy import event
+        from tests.conftest import async_engine
+        engine = async_engine.sync_engine
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            created = client.post("/api/auth/register", json=test_user_data)
+            inserted = list(statements)
+            duplicate = client.post("/api/auth/register", json={**test_user_data, "email": "other@example.com"})
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        
+        assert created.status_code == 200
+        assert created.json()["id"] is not None
+        assert created.json()["created_at"] is not None
+        assert [statement.split()[0] for statement in inserted] == ["INSERT"]
+        assert duplicate.status_code == 400
+        assert duplicate.json()["detail"] == "Username already taken"
@@ -0,0 +1,48 @@
+import asyncio
+from sqlalchemy import text
+from app.core.database import create_db_engine, create_async_db_engine
+
+
+class TestDatabaseEngines:
+    """Test pool configuration, SQLite tuning and pool metrics"""
+    
+    def test_sqlite_connections_are_tuned(self, tmp_path):
+        """Test that every new SQLite connection runs in WAL mode with relaxed syncing"""
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+        with engine.connect() as connection:
+            journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+            synchronous = connection.execute(text("PRAGMA synchronous")).scalar()
+            cache_size = connection.execute(text("PRAGMA cache_size")).scalar()
+        engine.dispose()
+        
+        assert journal_mode == "wal"
+        assert synchronous == 1  # NORMAL
+        assert cache_size == -64000
+    
+    def test_pool_reports_checkouts_and_utilization(self, tmp_path):
+        """Test that the sync pool exports checkout counts, wait and utilization"""
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'pooled.db'}")
+        with engine.connect():
+            stats = engine.pool.get_stats()
+        engine.dispose()
+        
+        assert stats["checkouts"] == 1
+        assert stats["checked_out"] == 1
+        assert stats["utilization"] == round(1 / (stats["size"] + stats["max_overflow"]), 4)
+        assert stats["max_wait_ms"] >= 0
+    
+    def test_async_engine_is_pooled_and_tuned(self, tmp_path):
+        """Test that the async engine gets the same pragmas and pool metrics"""
+        async def scenario():
+            engine = create_async_db_engine(f"sqlite:///{tmp_path / 'async.db'}")
+            async with engine.connect() as connection:
+                journal_mode = (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+            stats = engine.sync_engine.pool.get_stats()
+            await engine.dispose()
+            return journal_mode, stats
+        
+        journal_mode, stats = asyncio.run(scenario())
+        
+        assert journal_mode == "wal"
+        assert stats["checkouts"] == 1
+        assert stats["checked_out"] == 0
@@ -1,5 +1,10 @@
+import asyncio
+import time
 import pytest
 from fastapi import status
+from app.services.idempotency import IdempotencyStore
+from app.models.experiment import Experiment
+from app.models.user import User
 
 class TestExperiments:
     """Test experiment endpoints and functionality"""
@@ -22,6 +27,25 @@ class TestExperiments:
         assert "average_ranks" in experiment
         assert "created_at" in experiment
     
+    def test_repeat_experiment_served_from_cache(self, client, auth_headers, test_experiment_data, fresh_experiment_cache):
+        """Test that an identical experiment reuses the cached results but is still stored"""
+        first = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers)
+        reordered = {
+            "companies": list(reversed(test_experiment_data["companies"])),
+            "categories": list(reversed(test_experiment_data["categories"])),
+        }
+        second = client.post("/api/experiments/", json=reordered, headers=auth_headers)
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert fresh_experiment_cache.get_stats()["hits"] == 1
+        
+        first_experiment = first.json()["experiment"]
+        second_experiment = second.json()["experiment"]
+        assert second_experiment["id"] != first_experiment["id"]
+        assert second_experiment["companies"] == reordered["companies"]
+        assert second_experiment["average_ranks"] == first_experiment["average_ranks"]
+    
     def test_create_experiment_without_auth(self, client, test_experiment_data):
         """Test experiment creation without authentication"""
         response = client.post("/api/experiments/", json=test_experiment_data)
@@ -149,7 +173,7 @@ class TestExperiments:
         """Test experiment data validation"""
         # Test with too many companies
         invalid_data = {
-            "companies": ["Apple", "Samsung", "Google", "Microsoft", "Amazon", "Tesla"],
+            "companies": [f"Company {i}" for i in range(101)],
             "categories": ["Technology"]
         }
         response = client.post("/api/experiments/", json=invalid_data, headers=auth_headers)
@@ -222,4 +246,393 @@ class TestExperiments:
         
         experiment = response.json()["experiment"]
         assert experiment["companies"] == test_data["companies"]
-        assert experiment["categories"] == test_data["categories"] 
\ No newline at end of file
+        assert experiment["categories"] == test_data["categories"] 
+
+
+class TestExperimentUpdate:
+    """Test incremental experiment re-runs"""
+    
+    @pytest.fixture
+    def ranked_categories(self, monkeypatch):
+        """Record which categories go through the ranking pipeline"""
+        import app.main
+        calls = []
+        original = app.main.ranking_service.rank_category
+        
+        async def spy(brands, category, samples=None):
+            calls.append(category)
+            return await original(brands, category, samples)
+        
+        monkeypatch.setattr(app.main.ranking_service, "rank_category", spy)
+        return calls
+    
+    def test_added_category_only_ranks_new_one(self, client, auth_headers, test_experiment_data, ranked_categories):
+        """Test that adding a category reuses the stored results of the others"""
+        created = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers).json()["experiment"]
+        ranked_categories.clear()
+        
+        categories = test_experiment_data["categories"] + ["Laptops"]
+        response = client.patch(f"/api/experiments/{created['id']}", json={"categories": categories}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert ranked_categories == ["Laptops"]
+        experiment = response.json()["experiment"]
+        assert experiment["id"] == created["id"]
+        assert experiment["categories"] == categories
+        for category in test_experiment_data["categories"]:
+            assert experiment["results"][category] == created["results"][category]
+        
+        stored = client.get(f"/api/experiments/{created['id']}", headers=auth_headers).json()
+        assert "Laptops" in stored["results"]
+    
+    def test_changed_companies_recompute_all(self, client, auth_headers, test_experiment_data, ranked_categories):
+        """Test that swapping a brand re-ranks every category"""
+        created = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers).json()["experiment"]
+        ranked_categories.clear()
+        
+        companies = ["Apple", "Samsung", "Xiaomi"]
+        response = client.patch(f"/api/experiments/{created['id']}", json={"companies": companies}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert sorted(ranked_categories) == sorted(test_experiment_data["categories"])
+        assert set(response.json()["experiment"]["average_ranks"]) == set(companies)
+    
+    def test_removed_category_needs_no_llm_calls(self, client, auth_headers, test_experiment_data, ranked_categories):
+        """Test that dropping a category is served entirely from stored results"""
+        created = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers).json()["experiment"]
+        ranked_categories.clear()
+        
+        response = client.patch(f"/api/experiments/{created['id']}", json={"categories": ["Smartphones"]}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert ranked_categories == []
+        assert list(response.json()["experiment"]["results"]) == ["Smartphones"]
+    
+    @pytest.mark.parametrize("update", [{"categories": []}, {"companies": ["Apple"]}, {"categories": [" "]}])
+    def test_invalid_update_leaves_experiment_untouched(self, client, auth_headers, test_experiment_data,
+                                                        ranked_categories, update):
+        """Test that an update failing the ranking input rules is rejected before the stored row changes"""
+        created = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers).json()["experiment"]
+        ranked_categories.clear()
+        
+        response = client.patch(f"/api/experiments/{created['id']}", json=update, headers=auth_headers)
+        
+        assert response.status_code == 422
+        assert ranked_categories == []
+        stored = client.get(f"/api/experiments/{created['id']}", headers=auth_headers).json()
+        assert stored["companies"] == created["companies"]
+        assert stored["results"] == created["results"]
+        assert stored["average_ranks"] == created["average_ranks"]
+    
+    def test_update_not_found(self, client, auth_headers):
+        """Test updating an experiment that does not exist"""
+        response = client.patch("/api/experiments/99999", json={"categories": ["Laptops"]}, headers=auth_headers)
+        assert response.status_code == 404
+
+
+class TestPartialResults:
+    """Test returning partial experiments at the deadline"""
+    
+    @pytest.fixture
+    def slow_category(self, monkeypatch):
+        """Make the "Slow" category take longer than the test deadline"""
+        from app.services.ranking_service import ranking_service
+        
+        async def get_rankings(brands, category):
+            if category == "Slow":
+                await asyncio.sleep(0.4)
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(brands)}, "reason": category}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", get_rankings)
+        monkeypatch.setattr(ranking_service.llm, "get_cached_rankings", lambda *args: None)
+    
+    def test_pending_category_completes_in_background(self, client, auth_headers, slow_category):
+        """Test that slow categories are marked pending and later written to the stored experiment"""
+        data = {"companies": ["Apple", "Samsung"], "categories": ["Fast", "Slow"], "allow_partial": True}
+        response = client.post("/api/experiments/", json=data, headers={**auth_headers, "X-Request-Deadline": "0.35"})
+        
+        assert response.status_code == 200
+        experiment = response.json()["experiment"]
+        assert experiment["pending_categories"] == ["Slow"]
+        assert experiment["results"]["Slow"]["status"] == "pending"
+        assert experiment["results"]["Fast"]["rankings"] == {"Apple": 1, "Samsung": 2}
+        
+        for _ in range(50):
+            time.sleep(0.05)
+            stored = client.get(f"/api/experiments/{experiment['id']}", headers=auth_headers).json()
+            if not stored["pending_categories"]:
+                break
+        
+        assert stored["pending_categories"] == []
+        assert stored["results"]["Slow"]["rankings"] == {"Apple": 1, "Samsung": 2}
+        assert stored["average_ranks"] == {"Apple": 1.0, "Samsung": 2.0}
+    
+    def test_pending_categories_stay_admitted(self, client, auth_headers, slow_category):
+        """Test that an experiment counts as in flight until its pending categories finish"""
+        from app.services.admission import admission_controller
+        data = {"companies": ["Apple", "Samsung"], "categories": ["Fast", "Slow"], "allow_partial": True}
+        response = client.post("/api/experiments/", json=data, headers={**auth_headers, "X-Request-Deadline": "0.35"})
+        
+        assert response.json()["experiment"]["pending_categories"] == ["Slow"]
+        assert admission_controller.get_stats()["experiments_in_flight"] == 1
+        
+        for _ in range(50):
+            time.sleep(0.05)
+            if not admission_controller.get_stats()["experiments_in_flight"]:
+                break
+        assert admission_controller.get_stats()["experiments_in_flight"] == 0
+    
+    def test_without_partial_mode_deadline_fails(self, client, auth_headers, slow_category):
+        """Test that the default mode still fails the whole request on deadline"""
+        data = {"companies": ["Apple", "Samsung"], "categories": ["Fast", "Slow"]}
+        response = client.post("/api/experiments/", json=data, headers={**auth_headers, "X-Request-Deadline": "0.35"})
+        assert response.status_code == 504
+    
+    @pytest.mark.parametrize("allow_partial", [False, True])
+    def test_queue_full_rejects_in_both_modes(self, client, auth_headers, monkeypatch, allow_partial):
+        """Test that a per-user queue rejection is a 429 with or without partial results, and nothing is stored"""
+        from app.services.ranking_service import ranking_service
+        from app.services.fairness import UserQueueFull
+        
+        async def rank_category(brands, category, samples=None):
+            raise UserQueueFull("Too many queued upstream calls")
+        
+        monkeypatch.setattr(ranking_service, "rank_category", rank_category)
+        data = {"companies": ["Apple", "Samsung"], "categories": ["Queue Full"], "allow_partial": allow_partial}
+        response = client.post("/api/experiments/", json=data, headers=auth_headers)
+        
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        assert client.get("/api/experiments/", headers=auth_headers).json() == []
+
+
+class TestIdempotency:
+    """Test Idempotency-Key handling on experiment creation"""
+    
+    def test_retry_replays_stored_response(self, client, auth_headers, test_experiment_data, fresh_idempotency_store):
+        """Test that a retried request returns the original experiment without a new row"""
+        headers = {**auth_headers, "Idempotency-Key": "retry-123"}
+        first = client.post("/api/experiments/", json=test_experiment_data, headers=headers)
+        second = client.post("/api/experiments/", json=test_experiment_data, headers=headers)
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.headers.get("Idempotent-Replayed") == "true"
+        assert second.json() == first.json()
+        assert fresh_idempotency_store.get_stats()["executed"] == 1
+        
+        experiments = client.get("/api/experiments/", headers=auth_headers).json()
+        assert len(experiments) == 1
+    
+    def test_key_reused_with_different_body(self, client, auth_headers, test_experiment_data):
+        """Test that reusing a key for a different experiment is rejected"""
+        headers = {**auth_headers, "Idempotency-Key": "retry-456"}
+        client.post("/api/experiments/", json=test_experiment_data, headers=headers)
+        
+        other = {**test_experiment_data, "companies": ["Apple", "Samsung"]}
+        response = client.post("/api/experiments/", json=other, headers=headers)
+        assert response.status_code == 422
+    
+    def test_concurrent_retry_awaits_in_flight(self):
+        """Test that a retry arriving mid-flight waits for the original instead of re-running"""
+        store = IdempotencyStore(use_redis=False)
+        calls = []
+        
+        async def handler():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"id": 1}
+        
+        async def run_both():
+            return await asyncio.gather(
+                store.run("1:key", "fp", handler),
+                store.run("1:key", "fp", handler),
+            )
+        
+        (first, first_replayed), (second, second_replayed) = asyncio.run(run_both())
+        
+        assert len(calls) == 1
+        assert first == second == {"id": 1}
+        assert [first_replayed, second_replayed] == [False, True]
+    
+    def test_failed_original_releases_key(self):
+        """Test that a failed request does not poison its Idempotency-Key"""
+        store = IdempotencyStore(use_redis=False)
+        
+        async def failing():
+            raise ValueError("upstream down")
+        
+        async def succeeding():
+            return {"id": 2}
+        
+        with pytest.raises(ValueError):
+            asyncio.run(store.run("1:key", "fp", failing))
+        
+        assert asyncio.run(store.run("1:key", "fp", succeeding)) == ({"id": 2}, False)
+    
+    def test_memory_records_are_bounded(self):
+        """Test that completed records beyond the cap are dropped oldest first"""
+        store = IdempotencyStore(use_redis=False, max_keys=2)
+        
+        async def handler():
+            return {"id": 3}
+        
+        for key in ("1:a", "1:b", "1:c"):
+            asyncio.run(store.run(key, "fp", handler))
+        
+        assert list(store._records) == ["idempotency:1:b", "idempotency:1:c"]
+    
+    def test_expired_records_are_purged(self, monkeypatch):
+        """Test that records past their TTL are removed, not just ignored"""
+        store = IdempotencyStore(use_redis=False, ttl=60)
+        
+        async def handler():
+            return {"id": 4}
+        
+        asyncio.run(store.run("1:old", "fp", handler))
+        later = time.time() + 120
+        monkeypatch.setattr(time, "time", lambda: later)
+        asyncio.run(store.run("1:new", "fp", handler))
+        
+        assert list(store._records) == ["idempotency:1:new"]
+
+
+class TestExperimentPagination:
+    """Test keyset pagination of the experiment list"""
+    
+    @pytest.fixture
+    def history(self, db_session, auth_headers, test_user_data):
+        """Five experiments stored in the same second, so paging relies on the id tie-break"""
+        user = db_session.query(User).filter(User.username == test_user_data["username"]).first()
+        results = {"Smartphones": {"rankings": {"Apple": 1, "Samsung": 2}, "reason": "", "metadata": {}}}
+        experiments = [
+            Experiment(user_id=user.id, companies=["Apple", "Samsung"], categories=["Smartphones"],
+                       results=results, average_ranks={"Apple": 1.0, "Samsung": 2.0})
+            for _ in range(5)
+        ]
+        db_session.add_all(experiments)
+        db_session.commit()
+        return sorted((experiment.id for experiment in experiments), reverse=True)
+    
+    def test_pages_follow_cursor(self, client, auth_headers, history):
+        """Test that following X-Next-Cursor walks the history newest first without repeats"""
+        seen, cursor = [], None
+        for _ in range(len(history)):
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/experiments/", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            if cursor is None:
+                assert response.headers["X-Total-Count"] == "5"
+                assert response.headers["X-Page-Count"] == "3"
+            else:
+                # Later pages skip the count
+                assert "X-Total-Count" not in response.headers
+            seen.extend(experiment["id"] for experiment in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        
+        assert seen == history
+    
+    def test_default_page_size(self, client, auth_headers, history):
+        """Test that the default page size applies without a limit"""
+        response = client.get("/api/experiments/", headers=auth_headers)
+        
+        assert len(response.json()) == 5
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_limit_is_capped(self, client, auth_headers):
+        """Test that page sizes above the cap are rejected"""
+        response = client.get("/api/experiments/", params={"limit": 10_000}, headers=auth_headers)
+        assert response.status_code == 422
+    
+    def test_cursor_for_missing_experiment(self, client, auth_headers, history, db_session):
+        """Test that a cursor whose anchor experiment is gone is rejected, not an empty page"""
+        response = client.get("/api/experiments/", params={"limit": 2}, headers=auth_headers)
+        cursor = response.headers["X-Next-Cursor"]
+        anchor = db_session.query(Experiment).filter(Experiment.id == response.json()[-1]["id"]).first()
+        db_session.delete(anchor)
+        db_session.commit()
+        
+        response = client.get("/api/experiments/", params={"cursor": cursor}, headers=auth_headers)
+        assert response.status_code == 400
+    
+    def test_invalid_cursor(self, client, auth_headers):
+        """Test that a malformed cursor is a client error"""
+        response = client.get("/api/experiments/", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestAdmissionControl:
+    """Test load shedding on the expensive routes"""
+    
+    @pytest.fixture
+    def saturated(self, monkeypatch):
+        """Pretend the server is already running its maximum number of experiments"""
+        from app.services.admission import admission_controller
+        monkeypatch.setattr(admission_controller, "max_experiments", 0)
+        return admission_controller
+    
+    def test_new_experiment_is_shed(self, client, auth_headers, test_experiment_data, saturated):
+        """Test that an uncached experiment gets a fast 503 with Retry-After"""
+        response = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers)
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(int(saturated.retry_after))
+        assert saturated.get_stats()["shed"]["experiments"] >= 1
+    
+    def test_cached_experiment_still_served(self, client, auth_headers, test_experiment_data, monkeypatch):
+        """Test that a repeat of a cached experiment is served while shedding"""
+        from app.services.admission import admission_controller
+        first = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers)
+        monkeypatch.setattr(admission_controller, "max_experiments", 0)
+        second = client.post("/api/experiments/", json=test_experiment_data, headers=auth_headers)
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+    
+    def test_batch_is_shed_before_streaming(self, client, saturated, monkeypatch):
+        """Test that an overloaded server rejects a whole batch up front instead of mid-stream"""
+        from app.services.ranking_service import ranking_service
+        
+        def no_batch(*args, **kwargs):
+            raise AssertionError("a shed batch must not start ranking")
+        
+        monkeypatch.setattr(ranking_service, "rank_batch", no_batch)
+        jobs = {"jobs": [{"brands": ["Batch A", "Batch B"], "categories": ["Load Shedding"]}]}
+        response = client.post("/rank/batch", json=jobs)
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(int(saturated.retry_after))
+    
+    def test_admitted_batch_counts_as_in_flight(self, client):
+        """Test that a running batch holds an experiment slot until its stream ends"""
+        from app.services.admission import admission_controller
+        jobs = {"jobs": [{"brands": ["Batch A", "Batch B"], "categories": ["Load Shedding"]}]}
+        admitted = admission_controller.get_stats()["admitted"]
+        
+        response = client.post("/rank/batch", json=jobs)
+        
+        assert response.status_code == 200
+        assert admission_controller.get_stats()["admitted"] == admitted + 1
+        assert admission_controller.get_stats()["experiments_in_flight"] == 0
+    
+    def test_rank_sheds_only_cache_misses(self, client, monkeypatch):
+        """Test that /rank serves cached rankings and sheds calls that would go upstream"""
+        from app.services.admission import admission_controller
+        cached = {"brands": ["Admitted A", "Admitted B"], "categories": ["Load Shedding"]}
+        assert client.post("/rank", json=cached).status_code == 200
+        
+        monkeypatch.setattr(admission_controller, "max_queue_wait", 0.0)
+        uncached = {"brands": ["Shed A", "Shed B"], "categories": ["Load Shedding"]}
+        
+        assert client.post("/rank", json=cached).status_code == 200
+        response = client.post("/rank", json=uncached)
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+    
+    def test_validation_is_shed(self, client, saturated):
+        """Test that uncached validation requests are shed"""
+        response = client.post("/api/validate/categories", json={"categories": ["Shed Category"]})
+        
+        assert response.status_code == 503
@@ -217,4 +217,14 @@ class TestHealth:
         
         # Health check should be fast even if database is slow
         data = response.json()
-        assert data["status"] == "healthy" 
\ No newline at end of file
+        assert data["status"] == "healthy"
+
+    def test_metrics_endpoint(self, client):
+        """Test metrics endpoint exposes ranking reuse statistics"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert "performance" in data
+        assert "upstream" in data["ranking"]
+        assert "derivation_rate" in data["ranking"]["preference_store"]
@@ -1,4 +1,6 @@
+import asyncio
 import pytest
+import json
 from fastapi import status
 
 class TestRanking:
@@ -69,7 +71,7 @@ class TestRanking:
         """Test ranking with validation errors"""
         # Test with too many brands
         invalid_data = {
-            "brands": ["Apple", "Samsung", "Google", "Microsoft", "Amazon", "Tesla"],
+            "brands": [f"Brand {i}" for i in range(101)],
             "categories": ["Technology"]
         }
         response = client.post("/rank", json=invalid_data)
@@ -283,4 +285,130 @@ class TestRanking:
         
         data = response.json()
         assert "rankings" in data
-        assert "average_ranks" in data 
\ No newline at end of file
+        assert "average_ranks" in data
+    
+    def test_rank_batch_streams_ndjson(self, client, monkeypatch):
+        """Test batch ranking streams one NDJSON line per job"""
+        from app.services.ranking_service import ranking_service
+        
+        async def fake_get_rankings(brands, category):
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(sorted(brands))}, "reason": "test"}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", fake_get_rankings)
+        
+        test_data = {"jobs": [
+            {"brands": ["Apple", "Samsung"], "categories": ["Smartphones"]},
+            {"brands": ["Nike", "Adidas", "Puma"], "categories": ["Sneakers", "Apparel"]},
+        ]}
+        response = client.post("/rank/batch", json=test_data)
+        assert response.status_code == 200
+        assert "application/x-ndjson" in response.headers["content-type"]
+        
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        assert sorted(line["index"] for line in lines) == [0, 1]
+        for line in lines:
+            job = test_data["jobs"][line["index"]]
+            assert set(line["rankings"].keys()) == set(job["categories"])
+            for brand in job["brands"]:
+                assert brand in line["average_ranks"]
+    
+    def test_rank_batch_dedupes_subproblems(self, client, monkeypatch):
+        """Test that shared (brand set, category) pairs are ranked once per batch"""
+        from app.services.ranking_service import ranking_service
+        calls = []
+        
+        async def fake_get_rankings(brands, category):
+            calls.append((tuple(sorted(brands)), category))
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(sorted(brands))}, "reason": "test"}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", fake_get_rankings)
+        
+        test_data = {"jobs": [
+            {"brands": ["Apple", "Samsung"], "categories": ["Smartphones", "Laptops"]},
+            {"brands": ["Samsung", "Apple"], "categories": ["Smartphones"]},
+            {"brands": ["Apple", "Samsung"], "categories": ["Laptops"]},
+        ]}
+        response = client.post("/rank/batch", json=test_data)
+        assert response.status_code == 200
+        
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        assert len(lines) == 3
+        assert len(calls) == 2
+        assert len(set(calls)) == 2
+    
+    def test_rank_batch_reports_job_errors(self, client, monkeypatch):
+        """Test that a failing job is reported inline without failing the batch"""
+        from app.services.ranking_service import ranking_service
+        
+        async def fake_get_rankings(brands, category):
+            if category == "Broken":
+                raise ValueError("Perplexity API error: boom")
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(brands)}, "reason": "test"}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", fake_get_rankings)
+        
+        test_data = {"jobs": [
+            {"brands": ["Apple", "Samsung"], "categories": ["Broken"]},
+            {"brands": ["Apple", "Samsung"], "categories": ["Smartphones"]},
+        ]}
+        response = client.post("/rank/batch", json=test_data)
+        assert response.status_code == 200
+        
+        lines = {line["index"]: line for line in (json.loads(l) for l in response.text.splitlines() if l)}
+        assert "error" in lines[0]
+        assert "rankings" in lines[1]
+    
+    def test_rank_batch_invalid_data(self, client):
+        """Test batch ranking input validation"""
+        response = client.post("/rank/batch", json={"jobs": []})
+        assert response.status_code == 422
+        
+        response = client.post("/rank/batch", json={"jobs": [{"brands": ["Apple"], "categories": ["Technology"]}]})
+        assert response.status_code == 422
+    
+    def test_rank_large_brand_set(self, client, monkeypatch):
+        """Test that brand sets above the prompt size are ranked via grouped calls"""
+        from app.services.ranking_service import ranking_service
+        calls = []
+        
+        async def fake_get_rankings(brands, category):
+            calls.append(list(brands))
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(sorted(brands))}, "reason": "test"}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", fake_get_rankings)
+        
+        brands = [f"Brand {i:02d}" for i in range(12)]
+        response = client.post("/rank", json={"brands": list(reversed(brands)), "categories": ["Technology"]})
+        assert response.status_code == 200
+        
+        rankings = response.json()["rankings"]["Technology"]
+        assert sorted(rankings, key=rankings.get) == brands
+        assert all(len(group) <= 5 for group in calls)
+    
+    def test_rank_brands_samples_validation(self, client):
+        """Test self-consistency sample count validation"""
+        invalid_data = {"brands": ["Apple", "Samsung"], "categories": ["Technology"], "samples": 0}
+        response = client.post("/rank", json=invalid_data)
+        assert response.status_code == 422
+        
+        invalid_data["samples"] = 100
+        response = client.post("/rank", json=invalid_data)
+        assert response.status_code == 422
+    
+    def test_rank_brands_deadline_header(self, client, monkeypatch):
+        """Test that a request exceeding its deadline header returns 504"""
+        from app.services.ranking_service import ranking_service
+        
+        async def slow_get_rankings(brands, category):
+            await asyncio.sleep(1.0)
+            return {"rankings": {brand: i + 1 for i, brand in enumerate(brands)}, "reason": "slow"}
+        
+        monkeypatch.setattr(ranking_service.llm, "get_rankings", slow_get_rankings)
+        monkeypatch.setattr(ranking_service.llm, "get_cached_rankings", lambda *args: None)
+        
+        response = client.post(
+            "/rank",
+            json={"brands": ["Apple", "Samsung"], "categories": ["Technology"]},
+            headers={"X-Request-Deadline": "0.05"},
+        )
+        assert response.status_code == 504
@@ -0,0 +1,282 @@
+import asyncio
+import time
+import pytest
+from app.services.tournament import TournamentRanker
+from app.services.preference_store import PreferenceStore
+from app.services.ranking_service import RankingService
+from app.services.consensus import ConsensusRanker, kendall_tau
+from app.services.experiment_cache import ExperimentCache
+
+
+def make_oracle(true_order):
+    """Build a fake group ranker that follows a fixed global order and records its calls"""
+    position = {brand: i for i, brand in enumerate(true_order)}
+    calls = []
+    
+    async def rank_group(brands, category):
+        calls.append(list(brands))
+        ordered = sorted(brands, key=lambda brand: position[brand])
+        return {"rankings": {brand: i + 1 for i, brand in enumerate(ordered)}, "reason": "oracle"}
+    
+    return rank_group, calls
+
+
+class TestTournamentRanker:
+    """Test the tournament/merge ranking engine for large brand sets"""
+    
+    def test_recovers_global_order(self):
+        """Test that merging group rankings reproduces a consistent global order"""
+        true_order = [f"Brand {i:02d}" for i in range(40)]
+        shuffled = true_order[::3] + true_order[1::3] + true_order[2::3]
+        rank_group, calls = make_oracle(true_order)
+        
+        result = asyncio.run(TournamentRanker(rank_group, group_size=5).rank(shuffled, "Sneakers"))
+        
+        ordered = sorted(result["rankings"], key=result["rankings"].get)
+        assert ordered == true_order
+        assert sorted(result["rankings"].values()) == list(range(1, 41))
+        assert result["metadata"]["llm_calls"] == len(calls)
+    
+    def test_groups_never_exceed_prompt_size(self):
+        """Test that no single LLM call ranks more brands than the group size"""
+        true_order = [f"Brand {i:03d}" for i in range(100)]
+        rank_group, calls = make_oracle(true_order)
+        
+        asyncio.run(TournamentRanker(rank_group, group_size=5).rank(list(reversed(true_order)), "Laptops"))
+        
+        assert calls
+        assert all(len(group) <= 5 for group in calls)
+        # Far fewer calls than comparing every pair
+        assert len(calls) < 100 * 99 // 2 // 10
+    
+    def test_small_set_single_call(self):
+        """Test that a set within the group size is ranked with one call"""
+        rank_group, calls = make_oracle(["Nike", "Adidas", "Puma"])
+        
+        result = asyncio.run(TournamentRanker(rank_group, group_size=5).rank(["Puma", "Nike", "Adidas"], "Sneakers"))
+        
+        assert len(calls) == 1
+        assert result["rankings"] == {"Nike": 1, "Adidas": 2, "Puma": 3}
+    
+    def test_missing_brands_keep_input_order(self):
+        """Test that brands omitted by the LLM are placed after ranked ones"""
+        async def rank_group(brands, category):
+            return {"rankings": {brands[-1]: 1}}
+        
+        result = asyncio.run(TournamentRanker(rank_group, group_size=5).rank(["A1", "B1", "C1"], "Cars"))
+        
+        assert result["rankings"] == {"C1": 1, "A1": 2, "B1": 3}
+
+
+class TestPreferenceStore:
+    """Test pairwise preference reuse across overlapping brand sets"""
+    
+    def test_subset_derived_from_superset(self):
+        """Test that a subset of a ranked set is answered locally"""
+        store = PreferenceStore(use_redis=False)
+        store.record("Sneakers", {"Nike": 1, "Adidas": 2, "Puma": 3})
+        
+        result = store.derive(["Puma", "Nike"], "sneakers")
+        
+        assert result is not None
+        assert result["rankings"] == {"Puma": 2, "Nike": 1}
+        assert store.get_stats()["derived"] == 1
+    
+    def test_uncovered_pair_is_a_miss(self):
+        """Test that a brand set with an unseen pair is not derived"""
+        store = PreferenceStore(use_redis=False)
+        store.record("Sneakers", {"Nike": 1, "Adidas": 2})
+        
+        assert store.derive(["Nike", "Adidas", "Reebok"], "Sneakers") is None
+        assert store.derive(["Nike", "Adidas"], "Smartphones") is None
+        stats = store.get_stats()
+        assert stats["uncovered"] == 2
+        assert stats["derivation_rate"] == 0
+    
+    def test_combined_rankings_cover_superset(self):
+        """Test that pairs from several rankings combine into a larger derived ranking"""
+        store = PreferenceStore(use_redis=False)
+        store.record("Coffee", {"Starbucks": 1, "Dunkin": 2})
+        store.record("Coffee", {"Dunkin": 1, "Caribou": 2})
+        store.record("Coffee", {"Starbucks": 1, "Caribou": 2})
+        
+        result = store.derive(["Caribou", "Dunkin", "Starbucks"], "Coffee")
+        
+        assert result["rankings"] == {"Caribou": 3, "Dunkin": 2, "Starbucks": 1}
+    
+    def test_conflicting_preferences_not_derived(self):
+        """Test that contradicting observations force an upstream call"""
+        store = PreferenceStore(use_redis=False)
+        store.record("Cars", {"Toyota": 1, "Honda": 2})
+        store.record("Cars", {"Honda": 1, "Toyota": 2})
+        
+        assert store.derive(["Toyota", "Honda"], "Cars") is None
+        assert store.get_stats()["conflicts"] == 1
+    
+    def test_cyclic_preferences_not_derived(self):
+        """Test that a preference cycle is treated as inconsistent"""
+        store = PreferenceStore(use_redis=False)
+        store.record("Cars", {"A1": 1, "B1": 2})
+        store.record("Cars", {"B1": 1, "C1": 2})
+        store.record("Cars", {"C1": 1, "A1": 2})
+        
+        assert store.derive(["A1", "B1", "C1"], "Cars") is None
+        assert store.get_stats()["conflicts"] == 1
+    
+    def test_ranking_service_skips_upstream_for_subset(self, monkeypatch):
+        """Test that the ranking pipeline answers a covered subset without an upstream call"""
+        service = RankingService(preferences=PreferenceStore(use_redis=False))
+        calls = []
+        
+        async def fake_get_rankings(brands, category):
+            calls.append(list(brands))
+            return {"rankings": {"Nike": 1, "Adidas": 2, "Puma": 3}, "reason": "test"}
+        
+        monkeypatch.setattr(service.llm, "get_rankings", fake_get_rankings)
+        monkeypatch.setattr(service.llm, "get_cached_rankings", lambda brands, category: None)
+        
+        asyncio.run(service.rank_category(["Nike", "Adidas", "Puma"], "Sneakers"))
+        result = asyncio.run(service.rank_category(["Nike", "Adidas"], "Sneakers"))
+        
+        assert len(calls) == 1
+        assert result["rankings"] == {"Nike": 1, "Adidas": 2}
+
+
+class TestExperimentCache:
+    """Test the whole-experiment result cache"""
+    
+    def test_canonical_signature(self):
+        """Test that company and category order do not change the cache key"""
+        cache = ExperimentCache(use_redis=False)
+        cache.set(["Nike", "Adidas"], ["Sneakers", "Apparel"], None, {"results": {}, "average_ranks": {"Nike": 1.0}})
+        
+        assert cache.get(["Adidas", "Nike"], ["Apparel", "Sneakers"])["average_ranks"] == {"Nike": 1.0}
+        assert cache.get(["Adidas", "Nike"], ["Apparel", "Sneakers"], samples=3) is None
+        assert cache.get_stats()["hits"] == 1
+    
+    def test_refresh_invalidates_dependent_experiments(self):
+        """Test that refreshing a category entry drops experiments sharing a brand pair with it"""
+        cache = ExperimentCache(use_redis=False)
+        cache.set(["Nike", "Adidas", "Puma"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        cache.set(["Nike", "Reebok"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        cache.set(["Nike", "Adidas"], ["Apparel"], None, {"results": {}, "average_ranks": {}})
+        
+        assert cache.invalidate(["Adidas", "Nike"], "sneakers") == 1
+        assert cache.get(["Nike", "Adidas", "Puma"], ["Sneakers"]) is None
+        assert cache.get(["Nike", "Reebok"], ["Sneakers"]) is not None
+        assert cache.get(["Nike", "Adidas"], ["Apparel"]) is not None
+    
+    def test_upstream_call_invalidates(self, monkeypatch):
+        """Test that the ranking pipeline invalidates the experiment cache on upstream refresh"""
+        cache = ExperimentCache(use_redis=False)
+        service = RankingService(preferences=PreferenceStore(use_redis=False), experiments=cache)
+        cache.set(["Nike", "Adidas"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        
+        async def fake_get_rankings(brands, category):
+            return {"rankings": {"Nike": 1, "Adidas": 2}, "reason": "test"}
+        
+        monkeypatch.setattr(service.llm, "get_rankings", fake_get_rankings)
+        monkeypatch.setattr(service.llm, "get_cached_rankings", lambda brands, category: None)
+        
+        asyncio.run(service.rank_category(["Nike", "Adidas"], "Sneakers"))
+        
+        assert cache.get(["Nike", "Adidas"], ["Sneakers"]) is None
+    
+    def test_memory_backend_is_bounded(self):
+        """Test that the least recently used experiment is evicted at capacity"""
+        cache = ExperimentCache(use_redis=False, max_entries=2)
+        cache.set(["Nike", "Adidas"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        cache.set(["Nike", "Puma"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        cache.get(["Nike", "Adidas"], ["Sneakers"])
+        cache.set(["Nike", "Reebok"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        
+        assert cache.get(["Nike", "Puma"], ["Sneakers"]) is None
+        assert cache.get(["Nike", "Adidas"], ["Sneakers"]) is not None
+        assert cache.get_stats()["evictions"] == 1
+        assert "expdeps:sneakers:puma" not in cache._index
+    
+    def test_expired_entries_are_swept(self, monkeypatch):
+        """Test that expired experiments and their index sets are removed on write"""
+        cache = ExperimentCache(use_redis=False, ttl=60)
+        cache.set(["Nike", "Adidas"], ["Sneakers"], None, {"results": {}, "average_ranks": {}})
+        
+        later = time.time() + 120
+        monkeypatch.setattr(time, "time", lambda: later)
+        cache.set(["Puma", "Reebok"], ["Apparel"], None, {"results": {}, "average_ranks": {}})
+        
+        assert cache.get_stats()["entries"] == 1
+        assert set(cache._index) == {"expdeps:apparel:puma", "expdeps:apparel:reebok"}
+
+
+class TestConsensusRanker:
+    """Test self-consistency sampling with early stopping"""
+    
+    def test_kendall_tau(self):
+        """Test Kendall tau for identical, reversed and partially agreeing rankings"""
+        brands = ["Nike", "Adidas", "Puma"]
+        forward = {"Nike": 1, "Adidas": 2, "Puma": 3}
+        
+        assert kendall_tau(brands, forward, forward) == 1.0
+        assert kendall_tau(brands, forward, {"Nike": 3, "Adidas": 2, "Puma": 1}) == -1.0
+        assert kendall_tau(brands, forward, {"Nike": 1, "Adidas": 3, "Puma": 2}) == pytest.approx(1 / 3)
+    
+    def test_stops_early_when_samples_agree(self):
+        """Test that agreeing samples stop sampling before K completes"""
+        started = []
+        
+        async def rank_sample(brands, category, index):
+            started.append(index)
+            # Later samples are slow - they should be cancelled
+            await asyncio.sleep(0 if index < 3 else 5)
+            return {"rankings": {"Nike": 1, "Adidas": 2, "Puma": 3}, "reason": "same"}
+        
+        ranker = ConsensusRanker(rank_sample, threshold=0.8, min_samples=3)
+        result = asyncio.run(ranker.rank(["Nike", "Adidas", "Puma"], "Sneakers", 7))
+        
+        assert result["rankings"] == {"Nike": 1, "Adidas": 2, "Puma": 3}
+        assert result["metadata"]["agreement"] == 1.0
+        assert result["metadata"]["samples_used"] == 3
+        assert result["metadata"]["early_stopped"] is True
+    
+    def test_disagreeing_samples_use_all_and_vote(self):
+        """Test that disagreeing samples run to K and produce a Borda consensus"""
+        orders = [
+            {"Nike": 1, "Adidas": 2, "Puma": 3},
+            {"Adidas": 1, "Nike": 2, "Puma": 3},
+            {"Nike": 1, "Puma": 2, "Adidas": 3},
+            {"Puma": 1, "Nike": 2, "Adidas": 3},
+        ]
+        
+        async def rank_sample(brands, category, index):
+            return {"rankings": orders[index]}
+        
+        ranker = ConsensusRanker(rank_sample, threshold=0.9, min_samples=3)
+        result = asyncio.run(ranker.rank(["Nike", "Adidas", "Puma"], "Sneakers", 4))
+        
+        assert result["metadata"]["samples_used"] == 4
+        assert result["metadata"]["early_stopped"] is False
+        assert result["metadata"]["agreement"] < 0.9
+        assert result["rankings"]["Nike"] == 1
+    
+    def test_ranking_service_caches_samples(self, monkeypatch):
+        """Test that samples are drawn through per-sample cache keys"""
+        service = RankingService(preferences=PreferenceStore(use_redis=False))
+        sample_cache = {}
+        calls = []
+        
+        async def fake_get_rankings(brands, category, sample=None):
+            calls.append(sample)
+            sample_cache[sample] = {"rankings": {"Nike": 1, "Adidas": 2}, "reason": "test"}
+            return sample_cache[sample]
+        
+        monkeypatch.setattr(service.llm, "get_rankings", fake_get_rankings)
+        monkeypatch.setattr(service.llm, "get_cached_rankings", lambda brands, category, sample=None: sample_cache.get(sample))
+        
+        first = asyncio.run(service.rank_category(["Nike", "Adidas"], "Sneakers", samples=3))
+        calls_after_first = len(calls)
+        second = asyncio.run(service.rank_category(["Nike", "Adidas"], "Sneakers", samples=3))
+        
+        assert first["rankings"] == second["rankings"] == {"Nike": 1, "Adidas": 2}
+        assert calls_after_first == 3
+        assert len(calls) == calls_after_first
+        assert all(sample is not None for sample in calls)
@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.models.tracking import TrackedExperiment, TrackedSnapshot
+from app.services.tracking_scheduler import TrackingScheduler, rank_deltas
+
+
+class FakeRanking:
+    """Ranking pipeline stand-in that serves whatever ranks the test sets"""
+
+    def __init__(self, rankings):
+        self.rankings = rankings
+        self.calls = 0
+
+    async def rank_category(self, brands, category, samples=None):
+        self.calls += 1
+        return {"rankings": dict(self.rankings[category]), "reason": "test"}
+
+
+@pytest.fixture
+def tracked_payload():
+    return {
+        "name": "Daily sneakers",
+        "companies": ["Nike", "Adidas", "Puma"],
+        "categories": ["Sneakers"],
+        "interval_seconds": 86400,
+    }
+
+
+@pytest.fixture
+def scheduler_factory(db_session):
+    """Build schedulers that write to the test database"""
+    from tests.conftest import async_engine
+    session_factory = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def build(ranking):
+        return TrackingScheduler(session_factory=session_factory, ranking=ranking, poll_interval=0)
+    return build
+
+
+def make_due(db_session, tracked_id):
+    db_session.expire_all()
+    tracked = db_session.query(TrackedExperiment).filter(TrackedExperiment.id == tracked_id).first()
+    tracked.next_run_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db_session.commit()
+
+
+class TestTracking:
+    """Test tracked experiments and scheduled refreshes"""
+
+    def test_rank_deltas(self):
+        """Test that only moved or new ranks are reported"""
+        previous = {"Sneakers": {"Nike": 1, "Adidas": 2, "Puma": 3}}
+        current = {"Sneakers": {"Nike": 2, "Adidas": 1, "Puma": 3}, "Apparel": {"Nike": 1}}
+
+        assert rank_deltas(previous, current) == {
+            "Sneakers": {"Nike": 2, "Adidas": 1},
+            "Apparel": {"Nike": 1},
+        }
+        assert rank_deltas(current, current) == {}
+
+    def test_create_tracked_experiment(self, client, auth_headers, tracked_payload):
+        """Test that a new tracked set is scheduled for an immediate first run"""
+        response = client.post("/api/tracking/", json=tracked_payload, headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["companies"] == tracked_payload["companies"]
+        assert data["is_active"] is True
+        assert data["next_run_at"] is not None
+        assert data["last_run_at"] is None
+
+    def test_interval_below_minimum_rejected(self, client, auth_headers, tracked_payload):
+        """Test that overly frequent tracking cadences are rejected"""
+        response = client.post("/api/tracking/", json={**tracked_payload, "interval_seconds": 60}, headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_scheduler_stores_only_deltas(self, client, auth_headers, tracked_payload, db_session, scheduler_factory):
+        """Test that runs store the first full ranking, then only changes"""
+        tracked_id = client.post("/api/tracking/", json=tracked_payload, headers=auth_headers).json()["id"]
+        ranking = FakeRanking({"Sneakers": {"Nike": 1, "Adidas": 2, "Puma": 3}})
+        scheduler = scheduler_factory(ranking)
+
+        assert asyncio.run(scheduler.run_due()) == 1
+        # Not due again until the interval passes
+        assert asyncio.run(scheduler.run_due()) == 0
+
+        make_due(db_session, tracked_id)
+        asyncio.run(scheduler.run_due())
+
+        make_due(db_session, tracked_id)
+        ranking.rankings = {"Sneakers": {"Nike": 2, "Adidas": 1, "Puma": 3}}
+        asyncio.run(scheduler.run_due())
+
+        assert ranking.calls == 3
+        snapshots = db_session.query(TrackedSnapshot).order_by(TrackedSnapshot.run_at).all()
+        assert [snapshot.changes for snapshot in snapshots] == [
+            {"Sneakers": {"Nike": 1, "Adidas": 2, "Puma": 3}},
+            {"Sneakers": {"Nike": 2, "Adidas": 1}},
+        ]
+
+    def test_failed_refresh_backs_off(self, client, auth_headers, tracked_payload, db_session, scheduler_factory):
+        """Test that a failed refresh is rescheduled after the retry delay instead of the next poll"""
+        tracked_id = client.post("/api/tracking/", json=tracked_payload, headers=auth_headers).json()["id"]
+        scheduler = scheduler_factory(FakeRanking({}))
+
+        assert asyncio.run(scheduler.run_due()) == 1
+        assert asyncio.run(scheduler.run_due()) == 0
+        assert scheduler.failures == 1
+        tracked = db_session.query(TrackedExperiment).filter(TrackedExperiment.id == tracked_id).first()
+        assert tracked.last_run_at is None
+        assert tracked.next_run_at is not None
+
+    def test_series_endpoint_makes_no_llm_calls(self, client, auth_headers, tracked_payload, db_session,
+                                                scheduler_factory, monkeypatch):
+        """Test that the time series is rebuilt from stored deltas only"""
+        tracked_id = client.post("/api/tracking/", json=tracked_payload, headers=auth_headers).json()["id"]
+        ranking = FakeRanking({"Sneakers": {"Nike": 1, "Adidas": 2, "Puma": 3}})
+        scheduler = scheduler_factory(ranking)
+        asyncio.run(scheduler.run_due())
+        make_due(db_session, tracked_id)
+        ranking.rankings = {"Sneakers": {"Nike": 3, "Adidas": 2, "Puma": 1}}
+        asyncio.run(scheduler.run_due())
+
+        from app.services.ranking_service import ranking_service
+
+        async def no_llm(*args, **kwargs):
+            raise AssertionError("series must not call the ranking pipeline")
+
+        monkeypatch.setattr(ranking_service, "rank_category", no_llm)
+        response = client.get(f"/api/tracking/{tracked_id}/series", headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["runs"]) == 2
+        assert [point["rank"] for point in data["series"]["Sneakers"]["Nike"]] == [1, 3]
+        assert [point["rank"] for point in data["series"]["Sneakers"]["Adidas"]] == [2]
+        assert data["latest_rankings"] == {"Sneakers": {"Nike": 3, "Adidas": 2, "Puma": 1}}
+
+    def test_series_not_found(self, client, auth_headers):
+        """Test the series of a tracked set that does not exist"""
+        response = client.get("/api/tracking/99999/series", headers=auth_headers)
+        assert response.status_code == 404